@@ -23,7 +23,7 @@ import time
 from typing import Any, List, Optional
 
 from dubbo.common.exceptions import RegisterException
-from dubbo.connection.connections import connection_pool
+from dubbo.connection.connections import get_connection_pool
 
 logger = logging.getLogger('python-dubbo')
 
@@ -37,7 +37,7 @@ class DubboClient(object):
         :param interface: 接口名，例如：com.qianmi.pc.es.api.EsProductQueryProvider
         :param version: 接口的版本号，例如：1.0.0，默认为1.0.0
         :param dubbo_version: dubbo的版本号，默认为2.4.10
-        :param host: 远程主机地址，用于绕过zookeeper进行直连，例如：172.21.4.98:20882
+        :param host: 远程主机地址，用于绕过zookeeper进行直连，例如：172.21.4.98:20882、[::1]:20880或者unix:/var/run/dubbo.sock
         """
         if not host:
             raise RegisterException('host至少需要填入一个')
@@ -70,11 +70,29 @@ class DubboClient(object):
         :param timeout: 请求超时时间（秒），不设置则不会超时
         :return:
         """
+        host = self.__host
+        request_param = self._build_request_param(method, args, param_types)
+
+        logger.debug('Start request, host={}, params={}'.format(host, request_param))
+        start_time = time.time()
+        result = get_connection_pool().get(host, request_param, timeout)
+        cost_time = int((time.time() - start_time) * 1000)
+        logger.debug('Finish request, host={}, params={}'.format(host, request_param))
+        logger.debug('Request invoked, host={}, params={}, result={}, cost={}ms, timeout={}s'.format(
+            host, request_param, result, cost_time, timeout))
+        return result
+
+    def _build_request_param(self, method, args, param_types):
+        """
+        构造编码器所需的请求参数
+        :param method:
+        :param args:
+        :param param_types:
+        :return:
+        """
         if not isinstance(args, (list, tuple)):
             args = [args]
 
-        host = self.__host
-
         request_param = {
             'dubbo_version': self.__dubbo_version,
             'version': '',
@@ -83,16 +101,40 @@ class DubboClient(object):
             'arguments': args,
             'context': None
         }
-        
+
         # 如果提供了参数类型信息，添加到请求参数中
         if param_types:
             request_param['parameter_types'] = param_types
+        return request_param
 
-        logger.debug('Start request, host={}, params={}'.format(host, request_param))
+    def get_host(self):
+        return self.__host
+
+
+class AsyncDubboClient(DubboClient):
+    """
+    基于asyncio的dubbo客户端，调用不会阻塞线程，同一个事件循环上可以同时发起大量调用
+    """
+
+    async def call(self, method, args=(), param_types=None, timeout=None):
+        """
+        执行远程调用，参数与DubboClient.call一致
+        :param method: 远程调用的方法名
+        :param args: 方法参数
+        :param param_types: 参数类型列表，如['int', 'java.lang.String']
+        :param timeout: 请求超时时间（秒），不设置则不会超时
+        :return:
+        """
+        # asyncio的导入耗时较长，只在使用异步客户端时才导入
+        from dubbo.connection.asyncio_connections import get_async_connection_pool
+
+        host = self.get_host()
+        request_param = self._build_request_param(method, args, param_types)
+
+        logger.debug('Start async request, host={}, params={}'.format(host, request_param))
         start_time = time.time()
-        result = connection_pool.get(host, request_param, timeout)
+        result = await get_async_connection_pool().get(host, request_param, timeout)
         cost_time = int((time.time() - start_time) * 1000)
-        logger.debug('Finish request, host={}, params={}'.format(host, request_param))
-        logger.debug('Request invoked, host={}, params={}, result={}, cost={}ms, timeout={}s'.format(
+        logger.debug('Async request invoked, host={}, params={}, result={}, cost={}ms, timeout={}s'.format(
             host, request_param, result, cost_time, timeout))
         return result
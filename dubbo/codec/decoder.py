@@ -18,14 +18,23 @@
  */
 """
 
+import logging
+import re
 from datetime import datetime
 from struct import unpack
 
 from dubbo.common.exceptions import HessianTypeError, DubboException, DubboResponseException
 from dubbo.common.constants import response_status_message
 
+logger = logging.getLogger('python-dubbo')
+
 functions = {}
 
+# UTF-16的代理项，Java以代理对的两个代码单元表示基本多文种平面之外的字符
+_SURROGATE_PATTERN = re.compile(u'[\ud800-\udfff]')
+# 4个字节的utf-8字符的首字节，Java按照代码单元编码，不会产生这样的字符
+_FOUR_BYTE_UTF8_PATTERN = re.compile(b'[\xf0-\xf7]')
+
 
 def ranges(*defined_ranges):
     """
@@ -180,25 +189,35 @@ class Response(object):
 
     def _read_utf(self, length):
         """
-        读取n个字符
+        读取n个UTF-16代码单元，每个代码单元占1到3个字节：
+        每次取出与剩余代码单元个数相同的字节数（不在字符中间截断）整体解码，直到读满n个代码单元
         :param length:
-        :return:
-        """
-        value = ''
-        for i in range(length):
-            ch = self.read_byte()
-            if ch < 0x80:
-                value += chr(ch)
-            elif (ch & 0xe0) == 0xc0:
-                ch1 = self.read_byte()
-                value += chr(((ch & 0x1f) << 6) + (ch1 & 0x3f))
-            elif (ch & 0xf0) == 0xe0:
-                ch1 = self.read_byte()
-                ch2 = self.read_byte()
-                value += chr(((ch & 0x0f) << 12) + ((ch1 & 0x3f) << 6) + (ch2 & 0x3f))
-            else:
-                raise ValueError('Can\'t parse utf-8 char {}'.format(ch))
-        return value.encode('utf-8')  # 将unicode转化为str类型
+        :return: 代理对尚未合并的字符串
+        """
+        data = self.__data
+        chunks = []
+        while length > 0:
+            start = self.__index
+            end = start + length
+            if end > len(data):
+                raise ValueError('Index {} bigger than data length {}'.format(end, len(data)))
+            # 窗口可能在最后一个字符的中间截断，根据最后一个字符的首字节补齐
+            lead = end - 1
+            while lead > start and 0x80 <= data[lead] <= 0xbf:
+                lead -= 1
+            if data[lead] >= 0xe0:
+                end = max(end, lead + 3)
+            elif data[lead] >= 0xc0:
+                end = max(end, lead + 2)
+            raw = bytes(data[start:end])
+            four_byte = _FOUR_BYTE_UTF8_PATTERN.search(raw)
+            if four_byte:
+                raise ValueError('Can\'t parse utf-8 char {}'.format(four_byte.group()[0]))
+            chunk = raw.decode('utf-8', 'surrogatepass')
+            self.__index = end
+            length -= len(chunk)
+            chunks.append(chunk)
+        return ''.join(chunks)
 
     @ranges((0x00, 0x1f), (0x30, 0x33), 0x52, ord('S'))
     def read_string(self):
@@ -207,21 +226,46 @@ class Response(object):
         :return:
         """
         value = self.read_byte()
-        string = ''
-        while value == 'R':
-            length = unpack('!h', self.read_bytes(2))[0]
-            string += self._read_utf(length)
+        chunks = []
+        # 长字符串被拆分为多个'R'块和最后一个块
+        while value == 0x52:
+            length = unpack('!H', self.read_bytes(2))[0]
+            chunks.append(self._read_utf(length))
             value = self.read_byte()
 
         if value == ord('S'):
-            length = unpack('!h', self.read_bytes(2))[0]
+            length = unpack('!H', self.read_bytes(2))[0]
         elif 0x00 <= value <= 0x1f:
             length = value
         else:
             length = (value - 0x30) << 8 | self.read_byte()
 
-        string += self._read_utf(length).decode('utf-8')
-        return string
+        chunks.append(self._read_utf(length))
+        return _join_surrogates(''.join(chunks))
+
+    @ranges((0x20, 0x2f), (0x34, 0x37), 0x41, 0x42)
+    def read_binary(self):
+        """
+        读取二进制数据
+        :return:
+        """
+        value = self.read_byte()
+        chunks = []
+        # 长数据被拆分为多个'A'块和最后一个块
+        while value == 0x41:
+            length = unpack('!H', self.read_bytes(2))[0]
+            chunks.append(self.read_bytes(length))
+            value = self.read_byte()
+
+        if value == 0x42:
+            length = unpack('!H', self.read_bytes(2))[0]
+        elif 0x20 <= value <= 0x2f:
+            length = value - 0x20
+        else:
+            length = (value - 0x34) << 8 | self.read_byte()
+
+        chunks.append(self.read_bytes(length))
+        return b''.join(chunks)
 
     @ranges((0x60, 0x6f), ord('O'))
     def read_object(self):
@@ -366,6 +410,8 @@ class Response(object):
         value = self.read_byte()
 
         if value == ord('M') or value == ord('H'):
+            if value == ord('M'):
+                _type = self.read_type()  # type对于Python来说没有用处
             result = {}
             self.objects.append(result)
             while self.get_byte() != ord('Z'):
@@ -435,6 +481,17 @@ class Response(object):
         return str(self.__data)
 
 
+def _join_surrogates(value):
+    """
+    把字符串中的UTF-16代理对合并为一个字符，单独出现的代理项保持不变
+    :param value:
+    :return:
+    """
+    if not _SURROGATE_PATTERN.search(value):
+        return value
+    return value.encode('utf-16-le', 'surrogatepass').decode('utf-16-le', 'surrogatepass')
+
+
 def parse_response_head(response_head):
     """
     对响应头部的字节做解析
@@ -464,5 +521,51 @@ def parse_response_head(response_head):
     return heartbeat, unpack('!i', response_head[12:])[0]
 
 
+def parse_response_body(body):
+    """
+    对正常响应的body做解析，Java端返回的异常和解析过程中的异常都会作为返回值返回
+    :param body:
+    :return: 响应值或者异常对象
+    """
+    try:
+        res = Response(body)
+        flag = res.read_int()
+        if flag == 2:  # 响应的值为NULL
+            return None
+        elif flag == 1:  # 正常的响应值
+            return res.read_next()
+        elif flag == 0:  # 异常的响应值
+            return parse_error(res)
+        else:
+            raise DubboResponseException("Unknown result flag, expect '0' '1' '2', get " + str(flag))
+    except Exception as e:
+        logger.exception(e)
+        return e
+
+
+def parse_error_body(body):
+    """
+    对响应头部状态码不为OK时的错误body做解析
+    :param body:
+    :return:
+    """
+    error = Response(body).read_next()
+    return DubboResponseException('\n{}'.format(error))
+
+
+def parse_error(res):
+    """
+    对Java的异常错误信息进行解析
+    :param res:
+    :return:
+    """
+    err = res.read_error()
+    error = '\n{cause}: {detailMessage}\n'.format(**err)
+    stack_trace = err['stackTrace']
+    for trace in stack_trace:
+        error += '	at {declaringClass}.{methodName}({fileName}:{lineNumber})\n'.format(**trace)
+    return DubboResponseException(error)
+
+
 if __name__ == '__main__':
     pass
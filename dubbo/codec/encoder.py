@@ -10,12 +10,48 @@
 * double
 * java.lang.String
 * java.lang.Object
+* byte[]
+* java.util.Map
+* java.util.List等集合类型（需要通过parameter_types声明）
 """
+import re
 import struct
+import threading
 
-from dubbo.common.constants import MAX_INT_32, MIN_INT_32, DEFAULT_REQUEST_META
+from dubbo.common.constants import MAX_INT_32, MIN_INT_32, DEFAULT_REQUEST_META, REQUEST_TEMPLATE_CACHE_SIZE
 from dubbo.common.exceptions import HessianTypeError
-from dubbo.common.util import get_invoke_id, double_to_long_bits
+from dubbo.common.util import get_invoke_id
+
+# 请求头：魔数、标志位以及为invoke_id和body长度预留的12个字节
+_REQUEST_HEAD = bytes(bytearray(DEFAULT_REQUEST_META)) + bytes(12)
+_REQUEST_HEAD_LENGTH = len(_REQUEST_HEAD)
+_REQUEST_HEAD_TAIL = struct.Struct('!qi')
+
+# 定长的类型标记加数据，追加到缓冲区时只产生一个很小的临时bytes对象
+_BYTE_BYTE = struct.Struct('!BB')
+_BYTE_SHORT = struct.Struct('!BH')
+_BYTE_SIGNED_BYTE = struct.Struct('!Bb')
+_BYTE_SIGNED_SHORT = struct.Struct('!Bh')
+_BYTE_INT = struct.Struct('!Bi')
+_BYTE_LONG = struct.Struct('!Bq')
+_BYTE_DOUBLE = struct.Struct('!Bd')
+
+# 超过此长度的字符串（按照UTF-16代码单元计算）和二进制数据拆分为多个块
+_CHUNK_SIZE = 0x8000
+
+_NULL = b'N'
+_TRUE = b'T'
+_FALSE = b'F'
+_MAP_START = ord('H')
+_MAP_END = ord('Z')
+
+# 按照(dubbo_version, path, version, method, 参数类型)缓存的请求模板：
+# 请求头加上参数之前的部分、不含调用方context时的attachments，以及根据声明的参数类型编译的写入方法
+_templates = {}
+_templates_lock = threading.Lock()
+
+# 基本多文种平面之外的字符，Java中以UTF-16代理对的两个代码单元表示
+_ASTRAL_PATTERN = re.compile(u'([\U00010000-\U0010ffff])')
 
 
 class Object(object):
@@ -57,51 +93,99 @@ class Request(object):
     def __init__(self, request):
         self.__body = request
         self.__classes = []
+        self.__class_ids = {}
         self.types = []
         self.invoke_id = get_invoke_id()
 
     def encode(self):
         """
-        把请求序列化为字节数组
+        把请求序列化为字节数组：从缓存的请求模板开始，只编码参数，
+        body写完之后再回填invoke_id和body长度
         :return:
         """
-        request_body = self._encode_request_body()
-        invoke_id = list(bytearray(struct.pack('!q', self.invoke_id)))
-        request_head = DEFAULT_REQUEST_META + invoke_id + get_request_body_length(request_body)
-        return bytearray(request_head + request_body)
+        prefix, suffix, writers = self._get_template()
+        buf = bytearray(prefix)
+        arguments = self.__body['arguments']
+        if writers is not None and len(writers) == len(arguments):
+            for writer, arg in zip(writers, arguments):
+                writer(self, buf, arg)
+        else:
+            for arg in arguments:
+                self._write_value(buf, arg)
+        if suffix is None:
+            self._write_attachments(buf, self.__body['path'], self.__body['version'], self.__body['context'])
+        else:
+            buf += suffix
+        _REQUEST_HEAD_TAIL.pack_into(buf, 4, self.invoke_id, len(buf) - _REQUEST_HEAD_LENGTH)
+        return buf
 
     def _encode_request_body(self):
         """
         对所有已知的参数根据 dubbo 协议进行编码
         :return:
         """
-        dubbo_version = self.__body['dubbo_version']
-        path = self.__body['path']
-        version = self.__body['version']
-        method = self.__body['method']
-        arguments = self.__body['arguments']
-        context = self.__body['context']
-        
+        return self.encode()[_REQUEST_HEAD_LENGTH:]
+
+    def _get_template(self):
+        """
+        获取当前方法签名的请求模板，不存在时编码并缓存；缓存已满时淘汰最早加入的模板
+        显式提供了参数类型时直接以参数类型作为缓存的key，命中缓存时不需要再转换参数类型
+        :return: (请求头加上参数之前的部分, attachments, 参数的写入方法)，
+                 调用方提供了context时attachments为None，没有显式提供参数类型时写入方法为None
+        """
         # 检查是否有显式提供的参数类型
         explicit_param_types = self.__body.get('parameter_types', None)
-
-        body = []
-        body.extend(self._encode_single_value(dubbo_version))
-        body.extend(self._encode_single_value(path))
-        body.extend(self._encode_single_value(version))
-        body.extend(self._encode_single_value(method))
-        
-        # 如果有显式参数类型，使用它；否则自动推断
         if explicit_param_types:
-            # 将Java类型转换为JVM内部表示
-            param_types_string = self._convert_java_types_to_jvm_signature(explicit_param_types)
-            body.extend(self._encode_single_value(param_types_string))
+            signature = tuple(explicit_param_types)
         else:
-            body.extend(self._encode_single_value(self._get_parameter_types(arguments)))
-            
-        for arg in arguments:
-            body.extend(self._encode_single_value(arg))
+            signature = self._get_parameter_types(self.__body['arguments'])
+
+        key = (self.__body['dubbo_version'], self.__body['path'], self.__body['version'], self.__body['method'],
+               signature)
+        template = _templates.get(key)
+        if template is None:
+            template = self._build_template(*key)
+            with _templates_lock:
+                if len(_templates) >= REQUEST_TEMPLATE_CACHE_SIZE:
+                    del _templates[next(iter(_templates))]
+                _templates[key] = template
+
+        if self.__body['context']:
+            return template[0], None, template[2]
+        return template
+
+    def _build_template(self, dubbo_version, path, version, method, signature):
+        """
+        编码请求模板，模板中只有字符串，不会引用请求中的类定义和类型
+        :param signature: 推断得到的参数类型字符串，或者显式提供的Java类型元组
+        :return: (请求头加上参数之前的部分, 不含context的attachments, 参数的写入方法)
+        """
+        writers = None
+        if isinstance(signature, tuple):
+            writers = tuple(_compile_writer(_parse_java_type(java_type)) for java_type in signature)
+            # 将Java类型转换为JVM内部表示
+            signature = self._convert_java_types_to_jvm_signature(signature)
+
+        prefix = bytearray(_REQUEST_HEAD)
+        self._write_value(prefix, dubbo_version)
+        self._write_value(prefix, path)
+        self._write_value(prefix, version)
+        self._write_value(prefix, method)
+        self._write_str(prefix, signature)
 
+        suffix = bytearray()
+        self._write_attachments(suffix, path, version, None)
+        return bytes(prefix), bytes(suffix), writers
+
+    def _write_attachments(self, buf, path, version, context):
+        """
+        把attachments写入缓冲区
+        :param buf:
+        :param path:
+        :param version:
+        :param context: 调用方提供的attachments，可以覆盖默认的path、interface和version
+        :return:
+        """
         attachments = {
             'path': path,
             'interface': path,
@@ -110,16 +194,12 @@ class Request(object):
         if context is not None:
             attachments.update(context)
 
-        body.append(ord('H'))
+        buf.append(_MAP_START)
         for key in attachments.keys():
             value = attachments[key]
-            body.extend(self._encode_single_value(key))
-            body.extend(self._encode_single_value(value))
-        body.append(ord('Z'))
-
-        for i in range(len(body)):
-            body[i] = body[i] & 0xff
-        return body
+            self._write_value(buf, key)
+            self._write_value(buf, value)
+        buf.append(_MAP_END)
 
     def _get_parameter_types(self, arguments):
         """
@@ -208,6 +288,10 @@ class Request(object):
             return 'D'
         elif isinstance(_class, str):
             return 'L' + 'java/lang/String' + ';'
+        elif isinstance(_class, (bytes, bytearray, memoryview)):
+            return '[B'
+        elif isinstance(_class, dict):
+            return 'Ljava/util/Map;'
         elif isinstance(_class, Object):
             path = _class.get_path()
             path = 'L' + path.replace('.', '/') + ';'
@@ -225,213 +309,247 @@ class Request(object):
         :param value:
         :return:
         """
+        buf = bytearray()
+        self._write_value(buf, value)
+        return buf
 
-        # 布尔类型
-        if isinstance(value, bool):
-            return self._encode_bool(value)
+    def _write_value(self, buf, value):
+        """
+        根据 hessian 协议把单个变量写入缓冲区，常见类型通过类型直接查找写入方法
+        :param buf:
+        :param value:
+        :return:
+        """
+        writer = _WRITERS.get(type(value))
+        if writer is not None:
+            writer(self, buf, value)
+        # 布尔类型，必须放在整型的前面
+        elif isinstance(value, bool):
+            self._write_bool(buf, value)
         # 整型（包括长整型）
         elif isinstance(value, int):
-            return self._encode_int(value)
+            self._write_int(buf, value)
         # 浮点型
         elif isinstance(value, float):
-            return self._encode_float(value)
+            self._write_float(buf, value)
         # 字符串
         elif isinstance(value, str):
-            return self._encode_str(value)
+            self._write_str(buf, value)
         # 对象
         elif isinstance(value, Object):
-            return self._encode_object(value)
+            self._write_object(buf, value)
         # 列表
         elif isinstance(value, list):
-            return self._encode_list(value)
-        # null
-        elif value is None:
-            return [ord('N')]
+            self._write_list(buf, value)
+        # 二进制数据
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            self._write_bytes(buf, value)
+        # 字典
+        elif isinstance(value, dict):
+            self._write_dict(buf, value)
         else:
             raise HessianTypeError('Unknown args type: {}'.format(type(value)))
 
-    @staticmethod
-    def _encode_bool(value):
-        result = []
-        if value:
-            result.append(ord('T'))
-        else:
-            result.append(ord('F'))
-        return result
+    def _write_null(self, buf, value):
+        buf += _NULL
 
-    @staticmethod
-    def _encode_int(value):
+    def _write_bool(self, buf, value):
+        buf += _TRUE if value else _FALSE
+
+    def _write_int(self, buf, value):
         """
         对整数进行编码
+        :param buf:
         :param value:
         :return:
         """
-        result = []
         # 超出int类型范围的值则转化为long类型
         # 这里问题在于对于落在int范围内的数字，我们无法判断其是long类型还是int类型，所以一律认为其是int类型
         if value > MAX_INT_32 or value < MIN_INT_32:
-            result.append(ord('L'))
-            result.extend(list(bytearray(struct.pack('!q', value))))
-            return result
+            buf += _BYTE_LONG.pack(ord('L'), value)
+        elif -0x10 <= value <= 0x2f:
+            buf.append(value + 0x90)
+        elif -0x800 <= value <= 0x7ff:
+            buf += _BYTE_BYTE.pack(0xc8 + (value >> 8), value & 0xff)
+        elif -0x40000 <= value <= 0x3ffff:
+            buf += _BYTE_SHORT.pack(0xd4 + (value >> 16), value & 0xffff)
+        else:
+            buf += _BYTE_INT.pack(ord('I'), value)
 
-        if -0x10 <= value <= 0x2f:
-            result.append(value + 0x90)
+    def _write_long(self, buf, value):
+        """
+        对声明为long类型的整数进行编码
+        参见方法：com.alibaba.com.caucho.hessian.io.Hessian2Output#writeLong
+        :param buf:
+        :param value:
+        :return:
+        """
+        if -0x08 <= value <= 0x0f:
+            buf.append(value + 0xe0)
         elif -0x800 <= value <= 0x7ff:
-            result.append(0xc8 + (value >> 8))
-            result.append(value)
+            buf += _BYTE_BYTE.pack(0xf8 + (value >> 8), value & 0xff)
         elif -0x40000 <= value <= 0x3ffff:
-            result.append(0xd4 + (value >> 16))
-            result.append(value >> 8)
-            result.append(value)
+            buf += _BYTE_SHORT.pack(0x3c + (value >> 16), value & 0xffff)
+        elif MIN_INT_32 <= value <= MAX_INT_32:
+            buf += _BYTE_INT.pack(0x59, value)
         else:
-            result.append(ord('I'))
-            result.append(value >> 24)
-            result.append(value >> 16)
-            result.append(value >> 8)
-            result.append(value)
-        return result
+            buf += _BYTE_LONG.pack(ord('L'), value)
 
-    @staticmethod
-    def _encode_float(value):
+    def _write_float(self, buf, value):
         """
         对浮点类型进行编码
+        :param buf:
         :param value:
         :return:
         """
-        result = []
         int_value = int(value)
         if int_value == value:
             if int_value == 0:
-                result.append(0x5b)
-                return result
+                buf.append(0x5b)
+                return
             elif int_value == 1:
-                result.append(0x5c)
-                return result
+                buf.append(0x5c)
+                return
             elif -0x80 <= int_value < 0x80:
-                result.append(0x5d)
-                result.append(int_value)
-                return result
+                buf += _BYTE_SIGNED_BYTE.pack(0x5d, int_value)
+                return
             elif -0x8000 <= int_value < 0x8000:
-                result.append(0x5e)
-                result.append(int_value >> 8)
-                result.append(int_value)
-                return result
+                buf += _BYTE_SIGNED_SHORT.pack(0x5e, int_value)
+                return
 
         mills = int(value * 1000)
         if 0.001 * mills == value and MIN_INT_32 <= mills <= MAX_INT_32:
-            result.append(0x5f)
-            result.append(mills >> 24)
-            result.append(mills >> 16)
-            result.append(mills >> 8)
-            result.append(mills)
-            return result
-
-        bits = double_to_long_bits(value)
-        result.append(ord('D'))
-        result.append(bits >> 56)
-        result.append(bits >> 48)
-        result.append(bits >> 40)
-        result.append(bits >> 32)
-        result.append(bits >> 24)
-        result.append(bits >> 16)
-        result.append(bits >> 8)
-        result.append(bits)
-        return result
+            buf += _BYTE_INT.pack(0x5f, mills)
+            return
+
+        buf += _BYTE_DOUBLE.pack(ord('D'), value)
 
     @staticmethod
-    def _encode_utf(value):
+    def _encode_utf(units):
         """
         对字符串进行编码，编码格式utf-8
         参见方法：com.alibaba.com.caucho.hessian.io.Hessian2Output#printString
-        :param value:
+        printString按照UTF-16的代码单元逐个编码，代理对的两个代码单元以及单独出现的代理项都编码为3个字节
+        :param units: 已经由_to_utf16_units转换的字符串
         :return:
         """
-        result = []
-        for v in value:
-            ch = ord(v)
-            if ch < 0x80:
-                result.append(ch & 0xff)
-            elif ch < 0x800:
-                result.append((0xc0 + ((ch >> 6) & 0x1f)) & 0xff)
-                result.append((0x80 + (ch & 0x3f)) & 0xff)
-            else:
-                result.append((0xe0 + ((ch >> 12) & 0xf)) & 0xff)
-                result.append((0x80 + ((ch >> 6) & 0x3f)) & 0xff)
-                result.append((0x80 + (ch & 0x3f)) & 0xff)
-        return result
+        return units.encode('utf-8', 'surrogatepass')
 
-    def _encode_str(self, value):
+    def _write_str(self, buf, value):
         """
-        对一个字符串进行编码
+        对一个字符串进行编码，超过_CHUNK_SIZE个UTF-16代码单元的字符串拆分为多个'R'块和最后一个块；
+        每次只转换一个块大小的字符，编码过程中的临时数据不随字符串的长度增长
+        参见方法：com.alibaba.com.caucho.hessian.io.Hessian2Output#writeString
+        :param buf:
         :param value:
         :return:
         """
-        result = []
-        # 在进行网络传输操作时一律使用unicode进行操作
-        if isinstance(value, str):
-            value = value
         length = len(value)
+        # 常见的短ASCII字符串（如map的键）不需要转换代码单元，也不会分块
+        if length <= 0x3ff and value.isascii():
+            if length <= 0x1f:
+                buf.append(length)
+            else:
+                buf += _BYTE_BYTE.pack(0x30 + (length >> 8), length & 0xff)
+            buf += value.encode()
+            return
+
+        units = _to_utf16_units(value[:_CHUNK_SIZE])
+        offset = _CHUNK_SIZE
+        while True:
+            while len(units) > _CHUNK_SIZE:
+                size = _CHUNK_SIZE
+                # 块不能以高代理项结尾，否则代理对会被拆分到两个块中
+                if u'\ud800' <= units[size - 1] <= u'\udbff':
+                    size -= 1
+                buf += _BYTE_SHORT.pack(ord('R'), size)
+                buf += self._encode_utf(units[:size])
+                units = units[size:]
+            if offset >= len(value):
+                break
+            units += _to_utf16_units(value[offset:offset + _CHUNK_SIZE])
+            offset += _CHUNK_SIZE
+
+        length = len(units)
         if length <= 0x1f:
-            result.append(0x00 + length)
+            buf.append(length)
         elif length <= 0x3ff:
-            result.append(0x30 + (length >> 8))
-            result.append(length)
+            buf += _BYTE_BYTE.pack(0x30 + (length >> 8), length & 0xff)
         else:
-            result.append(ord('S'))
-            result.append(length >> 8)
-            result.append(length)
+            buf += _BYTE_SHORT.pack(ord('S'), length)
+        buf += self._encode_utf(units)
 
-        result.extend(self._encode_utf(value))
-        return result
+    def _write_bytes(self, buf, value):
+        """
+        对二进制数据进行编码，超过_CHUNK_SIZE字节的数据拆分为多个'A'块和最后一个块，直接从原数据复制到缓冲区
+        :param buf:
+        :param value: bytes、bytearray或者memoryview
+        :return:
+        """
+        data = memoryview(value).cast('B')
+        offset = 0
+        while len(data) - offset > _CHUNK_SIZE:
+            buf += _BYTE_SHORT.pack(ord('A'), _CHUNK_SIZE)
+            buf += data[offset:offset + _CHUNK_SIZE]
+            offset += _CHUNK_SIZE
+
+        length = len(data) - offset
+        if length <= 0xf:
+            buf.append(0x20 + length)
+        elif length <= 0x3ff:
+            buf += _BYTE_BYTE.pack(0x34 + (length >> 8), length & 0xff)
+        else:
+            buf += _BYTE_SHORT.pack(ord('B'), length)
+        buf += data[offset:]
 
-    def _encode_object(self, value):
+    def _write_object(self, buf, value):
         """
-        对一个对象进行编码
+        对一个对象进行编码，类定义按照类名和字段名缓存，同一个类的字段不同时写入新的类定义
+        :param buf:
         :param value:
         :return:
         """
-        result = []
         path = value.get_path()
         field_names = value.keys()
         
         # 特殊处理：对于ArrayList等Collection类型，使用List编码
         if path == "java.util.ArrayList" and 'elementData' in value:
             # 直接编码为List类型而不是Object
-            element_data = value['elementData']
-            return self._encode_list(element_data)
-
-        if path not in self.__classes:
-            result.append(ord('C'))
-            result.extend(self._encode_single_value(path))
-
-            result.extend(self._encode_single_value(len(field_names)))
-
+            self._write_list(buf, value['elementData'])
+            return
+
+        class_key = (path, tuple(field_names))
+        class_id = self.__class_ids.get(class_key)
+        if class_id is None:
+            buf.append(ord('C'))
+            self._write_str(buf, path)
+            self._write_int(buf, len(field_names))
             for field_name in field_names:
-                result.extend(self._encode_single_value(field_name))
+                self._write_value(buf, field_name)
+            class_id = len(self.__classes)
             self.__classes.append(path)
-        class_id = self.__classes.index(path)
+            self.__class_ids[class_key] = class_id
         if class_id <= 0xf:
-            class_id += 0x60
-            class_id &= 0xff
-            result.append(class_id)
+            buf.append(class_id + 0x60)
         else:
-            result.append(ord('O'))
-            result.extend(self._encode_single_value(class_id))
+            buf.append(ord('O'))
+            self._write_int(buf, class_id)
         for field_name in field_names:
-            result.extend(self._encode_single_value(value[field_name]))
-        return result
+            self._write_value(buf, value[field_name])
 
-    def _encode_list(self, value):
+    def _write_list(self, buf, value):
         """
         对一个列表进行编码
+        :param buf:
         :param value:
         :return:
         """
-        result = []
         length = len(value)
         if length == 0:
             # 没有值则无法判断类型，一律返回null
-            return self._encode_single_value(None)
+            buf += _NULL
+            return
+        first_type = type(value[0])
         if isinstance(value[0], bool):
             _type = '[boolean'
         elif isinstance(value[0], int):
@@ -440,31 +558,378 @@ class Request(object):
             _type = '[double'
         elif isinstance(value[0], str):
             _type = '[string'
-        elif isinstance(value[0], Object):
+        elif isinstance(value[0], (Object, dict)):
             _type = '[object'
         else:
             raise HessianTypeError('Unknown list type: {}'.format(value[0]))
-        if length < 0x7:
-            result.append(0x70 + length)
-            if _type not in self.types:
-                self.types.append(_type)
-                result.extend(self._encode_single_value(_type))
-            else:
-                result.extend(self._encode_single_value(self.types.index(_type)))
-        else:
-            result.append(0x56)
-            if _type not in self.types:
-                self.types.append(_type)
-                result.extend(self._encode_single_value(_type))
-            else:
-                result.extend(self._encode_single_value(self.types.index(_type)))
-            result.extend(self._encode_single_value(length))
+        self._write_list_head(buf, length, _type)
+        writer = _WRITERS.get(first_type) or Request._write_value
         for v in value:
-            if type(value[0]) != type(v):
+            if first_type is not type(v):
                 raise HessianTypeError('All elements in list must be the same type, first type'
-                                       ' is {0} but current type is {1}'.format(type(value[0]), type(v)))
-            result.extend(self._encode_single_value(v))
-        return result
+                                       ' is {0} but current type is {1}'.format(first_type, type(v)))
+            writer(self, buf, v)
+
+    def _write_list_head(self, buf, length, _type=None):
+        """
+        写入定长列表的开头，_type为None时写入无类型列表，否则写入类型或者对已写入类型的引用
+        :param buf:
+        :param length:
+        :param _type: 如'[int'，与Java中数组的类型名称一致
+        :return:
+        """
+        if _type is None:
+            if length <= 0x7:
+                buf.append(0x78 + length)
+            else:
+                buf.append(0x58)
+                self._write_int(buf, length)
+            return
+        buf.append(0x70 + length if length < 0x7 else 0x56)
+        self._write_type(buf, _type)
+        if length >= 0x7:
+            self._write_int(buf, length)
+
+    def _write_dict(self, buf, value):
+        """
+        把字典编码为无类型的map，在Java中为HashMap，键和值可以是任意支持的类型
+        参见方法：com.alibaba.com.caucho.hessian.io.MapSerializer#writeObject
+        :param buf:
+        :param value:
+        :return:
+        """
+        buf.append(_MAP_START)
+        for key, item in value.items():
+            writer = _WRITERS.get(type(key))
+            if writer is not None:
+                writer(self, buf, key)
+            else:
+                self._write_value(buf, key)
+            writer = _WRITERS.get(type(item))
+            if writer is not None:
+                writer(self, buf, item)
+            else:
+                self._write_value(buf, item)
+        buf.append(_MAP_END)
+
+    def _write_map_head(self, buf, _type=None):
+        """
+        写入map的开头，_type为None时写入无类型的'H'，否则写入'M'和类型
+        :param buf:
+        :param _type: 如'java.util.TreeMap'
+        :return:
+        """
+        if _type is None:
+            buf.append(_MAP_START)
+        else:
+            buf.append(ord('M'))
+            self._write_type(buf, _type)
+
+    def _write_type(self, buf, _type):
+        """
+        写入列表或者map的类型，已经写入过的类型只写入其编号
+        :param buf:
+        :param _type:
+        :return:
+        """
+        if _type not in self.types:
+            self.types.append(_type)
+            self._write_str(buf, _type)
+        else:
+            self._write_int(buf, self.types.index(_type))
+
+
+def _to_utf16_units(value):
+    """
+    把字符串转换为Java中的UTF-16代码单元，基本多文种平面之外的字符拆分为代理对
+    :param value:
+    :return: 长度即为Java中String的长度
+    """
+    # 在C中按照UTF-16编码来判断是否存在需要拆分的字符，比逐个比较字符快得多
+    if value.isascii() or len(value.encode('utf-16-le', 'surrogatepass')) == 2 * len(value):
+        return value
+    parts = _ASTRAL_PATTERN.split(value)
+    parts[1::2] = [_to_surrogate_pair(ch) for ch in parts[1::2]]
+    return ''.join(parts)
+
+
+def _to_surrogate_pair(ch):
+    """
+    把基本多文种平面之外的字符转换为UTF-16代理对
+    :param ch:
+    :return:
+    """
+    ch = ord(ch) - 0x10000
+    return chr(0xd800 + (ch >> 10)) + chr(0xdc00 + (ch & 0x3ff))
+
+
+# 按照值的确切类型查找写入方法，子类仍然通过isinstance判断
+_WRITERS = {
+    bool: Request._write_bool,
+    int: Request._write_int,
+    float: Request._write_float,
+    str: Request._write_str,
+    Object: Request._write_object,
+    list: Request._write_list,
+    bytes: Request._write_bytes,
+    bytearray: Request._write_bytes,
+    memoryview: Request._write_bytes,
+    dict: Request._write_dict,
+    type(None): Request._write_null,
+}
+
+
+# 基本类型的JVM签名
+_JVM_PRIMITIVES = {
+    'Z': 'boolean',
+    'B': 'byte',
+    'C': 'char',
+    'S': 'short',
+    'I': 'int',
+    'J': 'long',
+    'F': 'float',
+    'D': 'double',
+}
+
+# 可以省略包名的常用类型
+_SHORT_TYPE_NAMES = {name.rsplit('.', 1)[1]: name for name in (
+    'java.lang.Boolean', 'java.lang.Byte', 'java.lang.Short', 'java.lang.Integer', 'java.lang.Long',
+    'java.lang.Float', 'java.lang.Double', 'java.lang.Character', 'java.lang.String', 'java.lang.Object',
+    'java.util.Collection', 'java.util.List', 'java.util.ArrayList', 'java.util.LinkedList', 'java.util.Set',
+    'java.util.HashSet', 'java.util.LinkedHashSet', 'java.util.Map', 'java.util.HashMap',
+    'java.util.LinkedHashMap', 'java.util.TreeMap',
+)}
+
+# 声明的参数类型与对应的Python类型以及写入方法，值不是这些Python类型时按照实际类型写入
+_BOOL_TYPE = ((bool,), Request._write_bool)
+_INT_TYPE = ((int,), Request._write_int)
+_LONG_TYPE = ((int,), Request._write_long)
+_DOUBLE_TYPE = ((float, int), Request._write_float)
+_STRING_TYPE = ((str,), Request._write_str)
+_SCALAR_TYPES = {
+    'boolean': _BOOL_TYPE,
+    'java.lang.Boolean': _BOOL_TYPE,
+    'byte': _INT_TYPE,
+    'short': _INT_TYPE,
+    'int': _INT_TYPE,
+    'java.lang.Byte': _INT_TYPE,
+    'java.lang.Short': _INT_TYPE,
+    'java.lang.Integer': _INT_TYPE,
+    'long': _LONG_TYPE,
+    'java.lang.Long': _LONG_TYPE,
+    'float': _DOUBLE_TYPE,
+    'double': _DOUBLE_TYPE,
+    'java.lang.Float': _DOUBLE_TYPE,
+    'java.lang.Double': _DOUBLE_TYPE,
+    'char': _STRING_TYPE,
+    'java.lang.Character': _STRING_TYPE,
+    'java.lang.String': _STRING_TYPE,
+}
+
+# Java中以无类型列表传输的集合类型
+_COLLECTION_TYPES = {
+    'java.util.Collection', 'java.util.List', 'java.util.ArrayList', 'java.util.LinkedList', 'java.util.Set',
+    'java.util.HashSet', 'java.util.LinkedHashSet', 'java.util.SortedSet', 'java.util.TreeSet',
+}
+# 映射类型在hessian中的类型名称，None表示以无类型的'H'传输，
+# 与MapSerializer一致，HashMap以外的实现类以'M'加上类名传输
+_MAP_TYPES = {
+    'java.util.Map': None,
+    'java.util.HashMap': None,
+    'java.util.LinkedHashMap': 'java.util.LinkedHashMap',
+    'java.util.SortedMap': 'java.util.TreeMap',
+    'java.util.TreeMap': 'java.util.TreeMap',
+    'java.util.Hashtable': 'java.util.Hashtable',
+    'java.util.concurrent.ConcurrentMap': 'java.util.concurrent.ConcurrentHashMap',
+    'java.util.concurrent.ConcurrentHashMap': 'java.util.concurrent.ConcurrentHashMap',
+}
+# 数组元素类型在列表类型名称中的写法，其它类型使用全限定名
+_ARRAY_TYPE_NAMES = {
+    'boolean': 'boolean',
+    'short': 'short',
+    'int': 'int',
+    'long': 'long',
+    'float': 'float',
+    'double': 'double',
+    'java.lang.String': 'string',
+    'java.lang.Object': 'object',
+}
+_LIST_TYPES = (list, tuple)
+
+
+def _parse_java_type(java_type):
+    """
+    把Java类型解析为(类名, 泛型参数)，数组的类名为'[]'，泛型参数为数组元素的类型
+    支持'java.util.Map<String,java.util.List<Integer>>'、'int[]'以及'[Ljava.lang.String;'等写法
+    :param java_type:
+    :return:
+    """
+    java_type = java_type.strip()
+    if java_type.endswith('[]'):
+        return '[]', (_parse_java_type(java_type[:-2]),)
+    if java_type.startswith('['):
+        component = java_type[1:]
+        if component in _JVM_PRIMITIVES:
+            component = _JVM_PRIMITIVES[component]
+        return '[]', (_parse_java_type(component),)
+    if java_type.startswith('L') and java_type.endswith(';'):
+        java_type = java_type[1:-1].replace('/', '.')
+
+    arguments = ()
+    start = java_type.find('<')
+    if start >= 0 and java_type.endswith('>'):
+        arguments = []
+        depth = 0
+        offset = start + 1
+        for i in range(offset, len(java_type) - 1):
+            if java_type[i] == '<':
+                depth += 1
+            elif java_type[i] == '>':
+                depth -= 1
+            elif java_type[i] == ',' and depth == 0:
+                arguments.append(_parse_java_type(java_type[offset:i]))
+                offset = i + 1
+        arguments.append(_parse_java_type(java_type[offset:-1]))
+        arguments = tuple(arguments)
+        java_type = java_type[:start].strip()
+    return _SHORT_TYPE_NAMES.get(java_type, java_type), arguments
+
+
+def _compile_writer(parsed_type):
+    """
+    根据_parse_java_type解析得到的类型生成写入方法，集合类型的元素、键和值同样使用编译得到的写入方法；
+    写入方法与_WRITERS中的方法签名一致，值为None时写入null，值的类型与声明不符时按照实际类型写入
+    :param parsed_type:
+    :return: writer(request, buf, value)
+    """
+    name, arguments = parsed_type
+    if name == '[]':
+        component = arguments[0]
+        if component == ('byte', ()):
+            return _typed_writer((bytes, bytearray, memoryview), Request._write_bytes)
+        if component[0] == 'char':
+            # char[]在Java中按照字符串传输
+            return _typed_writer((str,), Request._write_str)
+        return _list_writer(_array_type_name(parsed_type), component)
+    if name in _SCALAR_TYPES:
+        return _typed_writer(*_SCALAR_TYPES[name])
+    if name in _COLLECTION_TYPES:
+        return _list_writer(None, arguments[0] if arguments else None)
+    if name in _MAP_TYPES:
+        if len(arguments) == 2:
+            return _map_writer(_MAP_TYPES[name], _compile_writer(arguments[0]), _compile_writer(arguments[1]))
+        return _map_writer(_MAP_TYPES[name], Request._write_value, Request._write_value)
+    if not name.startswith('java.'):
+        return _class_writer(name)
+    return Request._write_value
+
+
+def _array_type_name(parsed_type):
+    """
+    :param parsed_type:
+    :return: 数组在hessian列表中的类型名称，如'[int'、'[[string'
+    """
+    name, arguments = parsed_type
+    if name == '[]':
+        return '[' + _array_type_name(arguments[0])
+    return _ARRAY_TYPE_NAMES.get(name, name)
+
+
+def _class_writer(class_name):
+    """
+    声明为类的值是字典时按照此类的对象编码，使Java端得到声明的类型而不是HashMap
+    :param class_name:
+    :return:
+    """
+    def write(request, buf, value):
+        if type(value) is dict:
+            request._write_object(buf, Object(class_name, value))
+        elif value is None:
+            buf += _NULL
+        else:
+            request._write_value(buf, value)
+    return write
+
+
+def _typed_writer(python_types, writer):
+    """
+    :param python_types: 使用writer写入的Python类型
+    :param writer:
+    :return:
+    """
+    def write(request, buf, value):
+        if type(value) in python_types:
+            writer(request, buf, value)
+        elif value is None:
+            buf += _NULL
+        else:
+            request._write_value(buf, value)
+    return write
+
+
+def _list_writer(_type, element_type):
+    """
+    元素为基本类型时在循环中直接判断元素的类型，避免每个元素多一次函数调用
+    :param _type: 数组的类型名称，None表示Java中的集合类型
+    :param element_type: 解析得到的元素类型，None表示没有声明元素类型
+    :return:
+    """
+    if element_type is not None and element_type[0] in _SCALAR_TYPES:
+        python_types, element_writer = _SCALAR_TYPES[element_type[0]]
+
+        def write_elements(request, buf, value):
+            for element in value:
+                if type(element) in python_types:
+                    element_writer(request, buf, element)
+                elif element is None:
+                    buf += _NULL
+                else:
+                    request._write_value(buf, element)
+    else:
+        element_writer = Request._write_value if element_type is None else _compile_writer(element_type)
+        if element_writer is Request._write_value:
+            def write_elements(request, buf, value):
+                for element in value:
+                    writer = _WRITERS.get(type(element))
+                    if writer is not None:
+                        writer(request, buf, element)
+                    else:
+                        request._write_value(buf, element)
+        else:
+            def write_elements(request, buf, value):
+                for element in value:
+                    element_writer(request, buf, element)
+
+    def write(request, buf, value):
+        if type(value) in _LIST_TYPES:
+            request._write_list_head(buf, len(value), _type)
+            write_elements(request, buf, value)
+        elif value is None:
+            buf += _NULL
+        else:
+            request._write_value(buf, value)
+    return write
+
+
+def _map_writer(_type, key_writer, value_writer):
+    """
+    :param _type: map的类型名称，None表示无类型的'H'
+    :param key_writer:
+    :param value_writer:
+    :return:
+    """
+    def write(request, buf, value):
+        if isinstance(value, dict):
+            request._write_map_head(buf, _type)
+            for key, item in value.items():
+                key_writer(request, buf, key)
+                value_writer(request, buf, item)
+            buf.append(_MAP_END)
+        elif value is None:
+            buf += _NULL
+        else:
+            request._write_value(buf, value)
+    return write
 
 
 def get_request_body_length(body):
@@ -52,14 +52,43 @@ DUBBO_ZK_PROVIDERS = '/dubbo/{}/providers'
 DUBBO_ZK_CONSUMERS = '/dubbo/{}/consumers'
 DUBBO_ZK_CONFIGURATORS = '/dubbo/{}/configurators'
 
-# 客户端检测与远程主机的连接是否超时的间隔
+# 连接空闲超时之后，客户端连续发送心跳的间隔
 TIMEOUT_CHECK_INTERVAL = 0.03  # 30ms
 # 连接最长允许的空闲时间
 TIMEOUT_IDLE = 60
 # 连接允许的最多的超时次数
 TIMEOUT_MAX_TIMES = 3
 
+# 每个远程主机默认最多建立的连接数
+DEFAULT_CONNECTIONS_PER_HOST = 4
+# 建立连接的默认超时时间（秒）
+DEFAULT_CONNECT_TIMEOUT = 5
+# 同时向多个候选服务端建立连接时，启动下一个候选连接之前等待的时间（秒）
+DEFAULT_CONNECT_STAGGER = 0.25
+# 建立连接失败之后重连的初始退避时间和最长退避时间（秒），每失败一次退避时间翻倍
+RECONNECT_BACKOFF_BASE = 0.1
+RECONNECT_BACKOFF_MAX = 30
+
+# 连接池默认最多保持的连接数，超出时关闭最久未使用的空闲连接
+DEFAULT_MAX_CONNECTIONS = 1024
+# 连接默认最长未被使用的时间（秒），超过之后连接被关闭
+DEFAULT_IDLE_TIMEOUT = 300
+
+# 关闭连接池时默认等待在途请求完成的最长时间（秒）
+DEFAULT_DRAIN_TIMEOUT = 10
+
+# 连接池默认的reactor分片数，每个分片拥有独立的读取线程
+DEFAULT_REACTOR_SHARDS = 4
+
+# 请求超时时间轮的精度（秒）和每一圈的tick数
+TIMER_TICK_DURATION = 0.05
+TIMER_TICKS_PER_WHEEL = 512
+
 # 数据的头部大小为16个字节
 # 读取的数据类型：1 head; 2 error_body; 3 common_body;
 # 头部信息不存在invoke_id，所以为None
 DEFAULT_READ_PARAMS = 16, 1, None
+# 每个连接默认的读缓冲区大小
+READ_BUFFER_SIZE = 64 * 1024
+# 最多缓存多少个方法签名的请求头部编码结果
+REQUEST_TEMPLATE_CACHE_SIZE = 1024
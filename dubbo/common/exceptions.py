@@ -49,3 +49,24 @@ class DubboRequestTimeoutException(DubboException):
     dubbo请求超时异常
     """
     pass
+
+
+class DubboRejectedException(DubboException):
+    """
+    在途请求数达到上限，dubbo请求被拒绝
+    """
+    pass
+
+
+class DubboConnectionException(DubboException):
+    """
+    与服务端的连接已经断开或者暂时无法建立
+    """
+    pass
+
+
+class DubboRequestCancelledException(DubboException):
+    """
+    dubbo请求已经被调用方取消
+    """
+    pass
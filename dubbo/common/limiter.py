@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import threading
+import time
+
+from dubbo.common.exceptions import DubboRejectedException
+
+
+class InflightLimiter(object):
+    """
+    按照key统计并限制同时在途的请求数，达到上限时在有限的时间内排队等待，
+    等待超时或者不允许等待时抛出DubboRejectedException
+    """
+
+    def __init__(self, limit=None):
+        """
+        :param limit: 每个key允许的最大在途请求数，为None时只统计不限制
+        """
+        if limit is not None and limit < 1:
+            raise ValueError('limit must be positive, get {}'.format(limit))
+        self.limit = limit
+        # 被拒绝的请求数
+        self.rejected = 0
+        self._inflight = {}
+        self._cond = threading.Condition()
+
+    def acquire(self, key, timeout=0):
+        """
+        占用一个在途请求的名额
+        :param key:
+        :param timeout: 达到上限时最多等待的秒数，为0时立即拒绝
+        :return:
+        """
+        with self._cond:
+            if self.limit is not None and self._inflight.get(key, 0) >= self.limit:
+                deadline = time.time() + timeout
+                while self._inflight.get(key, 0) >= self.limit:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        raise DubboRejectedException(
+                            'Too many in-flight requests for {} (limit={})'.format(key, self.limit))
+                    self._cond.wait(remaining)
+            self._inflight[key] = self._inflight.get(key, 0) + 1
+
+    def release(self, key):
+        """
+        释放一个在途请求的名额，并唤醒排队等待的请求
+        :param key:
+        :return:
+        """
+        with self._cond:
+            count = self._inflight[key] - 1
+            if count:
+                self._inflight[key] = count
+            else:
+                del self._inflight[key]
+            # 不同的key共享一个条件变量，需要唤醒所有等待者由其自行判断
+            self._cond.notify_all()
+
+    def occupancy(self, key=None):
+        """
+        当前的在途请求数
+        :param key: 为None时返回所有key的在途请求数
+        :return:
+        """
+        with self._cond:
+            if key is None:
+                return dict(self._inflight)
+            return self._inflight.get(key, 0)
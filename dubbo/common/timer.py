@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import logging
+import math
+import threading
+import time
+
+from dubbo.common.constants import TIMER_TICK_DURATION, TIMER_TICKS_PER_WHEEL
+
+logger = logging.getLogger('python-dubbo')
+
+
+class Timeout(object):
+    """
+    时间轮中的一个定时任务
+    """
+    __slots__ = ('timer', 'callback', 'rounds', 'bucket')
+
+    def __init__(self, timer, callback, rounds, bucket):
+        self.timer = timer
+        self.callback = callback
+        # 还需要经过多少圈时间轮才会到期
+        self.rounds = rounds
+        self.bucket = bucket
+
+    def cancel(self):
+        """
+        取消此定时任务，已经到期或者已经取消的任务不做任何操作
+        :return:
+        """
+        self.timer._cancel(self)
+
+
+class HashedWheelTimer(object):
+    """
+    哈希时间轮，添加和取消定时任务的时间复杂度都为O(1)，到期的精度为一个tick；
+    时间轮本身不创建线程，由使用者周期性地调用advance来推进
+    """
+
+    def __init__(self, tick_duration=TIMER_TICK_DURATION, ticks_per_wheel=TIMER_TICKS_PER_WHEEL):
+        self.tick_duration = tick_duration
+        self._wheel = [set() for _ in range(ticks_per_wheel)]
+        self._start = time.monotonic()
+        # 下一个需要处理的tick
+        self._tick = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def add(self, delay, callback):
+        """
+        添加一个定时任务，到期之后在调用advance的线程中执行callback
+        :param delay: 多少秒之后到期
+        :param callback: 无参数的回调函数
+        :return: Timeout
+        """
+        with self._lock:
+            now = time.monotonic() - self._start
+            if self._size == 0:
+                # 时间轮为空时直接跳到当前的tick，避免下一次推进时追赶大量的空tick
+                self._tick = max(self._tick, int(now / self.tick_duration))
+            deadline = max(int(math.ceil((now + delay) / self.tick_duration)), self._tick)
+            rounds = (deadline - self._tick) // len(self._wheel)
+            bucket = self._wheel[deadline % len(self._wheel)]
+            timeout = Timeout(self, callback, rounds, bucket)
+            bucket.add(timeout)
+            self._size += 1
+        return timeout
+
+    def _cancel(self, timeout):
+        with self._lock:
+            if timeout.bucket is not None:
+                timeout.bucket.discard(timeout)
+                timeout.bucket = None
+                self._size -= 1
+
+    def advance(self):
+        """
+        处理所有已经到期的tick，执行到期的定时任务
+        :return: 到期的定时任务个数
+        """
+        expired = []
+        with self._lock:
+            current = int((time.monotonic() - self._start) / self.tick_duration)
+            while self._tick <= current and self._size > len(expired):
+                bucket = self._wheel[self._tick % len(self._wheel)]
+                for timeout in list(bucket):
+                    if timeout.rounds <= 0:
+                        bucket.discard(timeout)
+                        timeout.bucket = None
+                        expired.append(timeout)
+                    else:
+                        timeout.rounds -= 1
+                self._tick += 1
+            self._size -= len(expired)
+
+        for timeout in expired:
+            try:
+                timeout.callback()
+            except Exception as e:
+                logger.exception(e)
+        return len(expired)
+
+    def next_timeout(self):
+        """
+        距离下一个tick的时间，时间轮为空时返回None
+        :return:
+        """
+        if self._size == 0:
+            return None
+        next_tick_time = self._start + self._tick * self.tick_duration
+        return max(0, next_tick_time - time.monotonic())
+
+    def __len__(self):
+        return self._size
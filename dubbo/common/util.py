@@ -30,6 +30,9 @@ import logging
 
 logger = logging.getLogger('python-dubbo')
 
+# 通过Unix domain socket连接的host的前缀，例如：unix:/var/run/dubbo.sock
+UNIX_HOST_PREFIX = 'unix:'
+
 ip = None
 heartbeat_id = 0
 invoke_id = 0
@@ -100,6 +103,54 @@ def is_linux():
         return False
 
 
+def parse_host(host):
+    """
+    解析连接池使用的host，支持以下三种形式：
+    ip:port、[ipv6]:port以及unix:/path.sock
+    :param host:
+    :return: (地址族, ip或者socket文件路径, 端口)，Unix domain socket的端口为None
+    """
+    if host.startswith(UNIX_HOST_PREFIX):
+        path = host[len(UNIX_HOST_PREFIX):]
+        if not path:
+            raise ValueError('Missing socket path in host: {}'.format(host))
+        if not hasattr(socket, 'AF_UNIX'):
+            raise ValueError('Unix domain socket is not supported on this platform: {}'.format(host))
+        return socket.AF_UNIX, path, None
+    if host.startswith('['):
+        ip, sep, port = host[1:].partition(']:')
+        family = socket.AF_INET6
+    else:
+        ip, sep, port = host.rpartition(':')
+        if ':' in ip:
+            raise ValueError('IPv6 address must be enclosed in brackets, e.g. [::1]:20880: {}'.format(host))
+        family = socket.AF_INET
+    if not sep or not ip:
+        raise ValueError('Host should be ip:port, [ipv6]:port or unix:/path.sock: {}'.format(host))
+    try:
+        port = int(port)
+    except ValueError:
+        raise ValueError('Invalid port in host: {}'.format(host))
+    if not 0 < port < 65536:
+        raise ValueError('Port out of valid range in host: {}'.format(host))
+    return family, ip, port
+
+
+def format_host(family, ip, port):
+    """
+    parse_host的逆操作
+    :param family:
+    :param ip: ip或者socket文件路径
+    :param port:
+    :return:
+    """
+    if family == getattr(socket, 'AF_UNIX', None):
+        return UNIX_HOST_PREFIX + ip
+    if family == socket.AF_INET6:
+        return '[{}]:{}'.format(ip, port)
+    return '{}:{}'.format(ip, port)
+
+
 def parse_url(url_str):
     """
     把url字符串解析为适合于操作的对象
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import asyncio
+import logging
+import time
+import weakref
+from struct import unpack, pack
+
+from dubbo.codec.encoder import Request
+from dubbo.codec.decoder import parse_response_head, parse_response_body, parse_error_body
+from dubbo.common.constants import CLI_HEARTBEAT_RES_HEAD, CLI_HEARTBEAT_TAIL, CLI_HEARTBEAT_REQ_HEAD, \
+    TIMEOUT_CHECK_INTERVAL, TIMEOUT_IDLE, TIMEOUT_MAX_TIMES, DEFAULT_CONNECT_TIMEOUT
+from dubbo.common.exceptions import DubboResponseException, DubboRequestTimeoutException, \
+    DubboConnectionException
+from dubbo.common.util import get_invoke_id, parse_host
+
+logger = logging.getLogger('python-dubbo')
+
+# 数据的头部大小为16个字节
+HEAD_LENGTH = 16
+
+
+class DubboProtocol(asyncio.Protocol):
+    """
+    基于asyncio的dubbo协议实现，负责拆包并把响应交给连接池
+    """
+
+    def __init__(self, pool, host):
+        self._pool = pool
+        self._host = host
+        self._transport = None
+        self._buffer = bytearray()
+        self._heartbeat_handle = None
+        # 已经发送但是尚未收到响应的心跳次数
+        self.heartbeats = 0
+        # 此连接上尚未收到响应的invoke_id
+        self.pending = set()
+        self.last_active = time.time()
+
+    def connection_made(self, transport):
+        self._transport = transport
+        self._schedule_heartbeat(TIMEOUT_IDLE)
+
+    def connection_lost(self, exc):
+        logger.debug('{} closed, exc={}'.format(self._host, exc))
+        if self._heartbeat_handle is not None:
+            self._heartbeat_handle.cancel()
+        self._pool._delete_connection(self)
+        # 此连接上等待响应的请求立即以连接异常结束，而不是一直等待到超时
+        for invoke_id in list(self.pending):
+            self._pool._set_result(invoke_id, DubboConnectionException(
+                "Socket(host='{}'): Connection lost: {}".format(self._host, exc)))
+
+    def data_received(self, data):
+        self.last_active = time.time()
+        self._buffer.extend(data)
+        while len(self._buffer) >= HEAD_LENGTH:
+            body_length = unpack('!i', self._buffer[12:HEAD_LENGTH])[0]
+            frame_length = HEAD_LENGTH + body_length
+            if len(self._buffer) < frame_length:
+                break
+            head = bytes(self._buffer[:HEAD_LENGTH])
+            body = bytes(self._buffer[HEAD_LENGTH:frame_length])
+            del self._buffer[:frame_length]
+            try:
+                self._handle_frame(head, body)
+            except Exception as e:
+                logger.exception(e)
+
+    def _handle_frame(self, head, body):
+        """
+        处理一个完整的响应帧
+        :param head:
+        :param body:
+        :return:
+        """
+        invoke_id = unpack('!q', head[4:12])[0]
+        try:
+            heartbeat, _ = parse_response_head(head)
+        except DubboResponseException as e:  # 这里是dubbo的内部异常，与response中的业务异常不一样
+            logger.exception(e)
+            self._pool._set_result(invoke_id, parse_error_body(body))
+            return
+
+        if heartbeat == 2:
+            logger.debug('❤ request  -> {}'.format(self._host))
+            heartbeat_response = CLI_HEARTBEAT_RES_HEAD + list(head[4:12]) + CLI_HEARTBEAT_TAIL
+            self.write(bytearray(heartbeat_response))
+        elif heartbeat == 1:
+            logger.debug('❤ response -> {}'.format(self._host))
+            self.heartbeats = 0
+        else:
+            self._pool._set_result(invoke_id, parse_response_body(body))
+
+    def _schedule_heartbeat(self, delay):
+        loop = asyncio.get_running_loop()
+        self._heartbeat_handle = loop.call_later(delay, self._check_heartbeat)
+
+    def _check_heartbeat(self):
+        """
+        对连接进行检查，空闲超时则发送心跳，达到最大的超时次数则关闭连接
+        :return:
+        """
+        idle = time.time() - self.last_active
+        if idle <= TIMEOUT_IDLE:
+            self._schedule_heartbeat(TIMEOUT_IDLE - idle)
+            return
+
+        if self.heartbeats >= TIMEOUT_MAX_TIMES:
+            logger.debug('{} timeout and closed by client.'.format(self._host))
+            self.close()
+            return
+
+        self.heartbeats += 1
+        invoke_id = get_invoke_id()
+        req = CLI_HEARTBEAT_REQ_HEAD + list(bytearray(pack('!q', invoke_id))) + CLI_HEARTBEAT_TAIL
+        self.write(bytearray(req))
+        logger.debug('Send ❤ request for invoke_id {}, host={}'.format(invoke_id, self._host))
+        self._schedule_heartbeat(TIMEOUT_CHECK_INTERVAL)
+
+    def write(self, data):
+        """
+        向远程主机写数据，写缓冲和合并发送由asyncio的transport负责
+        :param data:
+        :return:
+        """
+        self._transport.write(data)
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+
+    def remote_host(self):
+        return self._host
+
+    def __repr__(self):
+        return self._host
+
+
+class AsyncConnectionPool(object):
+    """
+    基于asyncio的连接池，所有的连接和请求都运行在同一个事件循环上，
+    每个在途请求只占用一个Future，而不是一个线程
+    """
+
+    def __init__(self, connect_timeout=DEFAULT_CONNECT_TIMEOUT):
+        self.connect_timeout = connect_timeout
+        # 根据远程host保存与此host相关的连接
+        self._connection_pool = {}
+        # 正在建立中的连接，同一个host的并发请求共享一次连接
+        self._connecting = {}
+        # 等待响应的请求
+        self._futures = {}
+
+    async def get(self, host, request_param, timeout=None):
+        """
+        执行远程调用获取数据
+        :param host:
+        :param request_param:
+        :param timeout:
+        :return:
+        """
+        conn = await self._get_connection(host)
+        request = Request(request_param)
+        request_data = request.encode()
+        invoke_id = request.invoke_id
+
+        future = asyncio.get_running_loop().create_future()
+        self._futures[invoke_id] = future
+        conn.pending.add(invoke_id)
+        try:
+            conn.write(request_data)
+            logger.debug('Waiting response, invoke_id={}, timeout={}, host={}'.format(invoke_id, timeout, host))
+            result = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            err = "Socket(host='{}'): Read timed out. (read timeout={})".format(host, timeout)
+            raise DubboRequestTimeoutException(err)
+        finally:
+            conn.pending.discard(invoke_id)
+            self._futures.pop(invoke_id, None)
+
+        if isinstance(result, DubboConnectionException):
+            raise result
+        if isinstance(result, Exception):
+            logger.error('Exception {} for host {}'.format(result, host))
+            raise result
+        return result
+
+    async def _get_connection(self, host):
+        """
+        通过host获取到与此host相关的连接，本地会对连接进行缓存
+        :param host:
+        :return:
+        """
+        if not host or ':' not in host:
+            raise ValueError('invalid host {}'.format(host))
+        conn = self._connection_pool.get(host)
+        if conn is not None:
+            return conn
+
+        connecting = self._connecting.get(host)
+        if connecting is None:
+            connecting = asyncio.ensure_future(self._new_connection(host))
+            self._connecting[host] = connecting
+            connecting.add_done_callback(lambda _: self._connecting.pop(host, None))
+        return await asyncio.shield(connecting)
+
+    async def _new_connection(self, host):
+        """
+        创建一个新的连接
+        :param host:
+        :return:
+        """
+        family, ip, port = parse_host(host)
+        loop = asyncio.get_running_loop()
+        if port is None:
+            connecting = loop.create_unix_connection(lambda: DubboProtocol(self, host), ip)
+        else:
+            connecting = loop.create_connection(lambda: DubboProtocol(self, host), ip, port, family=family)
+        _, conn = await asyncio.wait_for(connecting, self.connect_timeout)
+        self._connection_pool[host] = conn
+        return conn
+
+    def _delete_connection(self, conn):
+        """
+        移除一个连接
+        :param conn:
+        :return:
+        """
+        host = conn.remote_host()
+        if self._connection_pool.get(host) is conn:
+            del self._connection_pool[host]
+
+    def _set_result(self, invoke_id, result):
+        """
+        把响应结果交给等待中的请求，已经超时的请求的响应直接丢弃
+        :param invoke_id:
+        :param result:
+        :return:
+        """
+        future = self._futures.get(invoke_id)
+        if future is None or future.done():
+            logger.debug('Drop response for unknown invoke_id={}'.format(invoke_id))
+            return
+        future.set_result(result)
+        logger.debug('Future set, invoked_id={}'.format(invoke_id))
+
+    def close(self):
+        """
+        关闭所有的连接
+        :return:
+        """
+        for conn in list(self._connection_pool.values()):
+            conn.close()
+        self._connection_pool.clear()
+
+
+# 每个事件循环拥有各自的连接池
+_loop_pools = weakref.WeakKeyDictionary()
+
+
+def get_async_connection_pool():
+    """
+    获取当前事件循环的连接池，不存在则创建
+    :return:
+    """
+    loop = asyncio.get_running_loop()
+    pool = _loop_pools.get(loop)
+    if pool is None:
+        pool = AsyncConnectionPool()
+        _loop_pools[loop] = pool
+    return pool
@@ -18,102 +18,632 @@
  */
 """
 
+import heapq
+import itertools
 import logging
+import os
+import queue
+import random
 import select
+import selectors
 import socket
 import threading
 import time
+import zlib
+from collections import deque
+from concurrent.futures import Future
+from itertools import islice
 from struct import unpack, pack
 
 from dubbo.codec.encoder import Request
-from dubbo.codec.decoder import Response, parse_response_head
+from dubbo.codec.decoder import parse_response_head, parse_response_body, parse_error_body
 from dubbo.common.constants import CLI_HEARTBEAT_RES_HEAD, CLI_HEARTBEAT_TAIL, CLI_HEARTBEAT_REQ_HEAD, \
-    TIMEOUT_CHECK_INTERVAL, TIMEOUT_IDLE, TIMEOUT_MAX_TIMES, DEFAULT_READ_PARAMS
-from dubbo.common.exceptions import DubboResponseException, DubboRequestTimeoutException
-from dubbo.common.util import get_invoke_id
+    TIMEOUT_CHECK_INTERVAL, TIMEOUT_IDLE, TIMEOUT_MAX_TIMES, DEFAULT_READ_PARAMS, DEFAULT_CONNECTIONS_PER_HOST, \
+    READ_BUFFER_SIZE, DEFAULT_CONNECT_TIMEOUT, RECONNECT_BACKOFF_BASE, RECONNECT_BACKOFF_MAX, \
+    DEFAULT_REACTOR_SHARDS, DEFAULT_MAX_CONNECTIONS, DEFAULT_IDLE_TIMEOUT, DEFAULT_DRAIN_TIMEOUT, \
+    DEFAULT_CONNECT_STAGGER
+from dubbo.common.exceptions import DubboResponseException, DubboRequestTimeoutException, \
+    DubboConnectionException, DubboRequestCancelledException, DubboRejectedException
+from dubbo.common.limiter import InflightLimiter
+from dubbo.common.timer import HashedWheelTimer
+from dubbo.common.util import get_invoke_id, is_linux, parse_host, format_host
+from dubbo.connection.socket_options import SocketOptions
 
 logger = logging.getLogger('python-dubbo')
 
+# Windows平台上的socket不支持sendmsg，合并发送时退化为拼接后再send
+_HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+# 一次sendmsg最多合并的缓冲区个数，不能超过系统的IOV_MAX
+SENDMSG_MAX_BUFFERS = 1024
+
+
+class Waker(object):
+    """
+    用于唤醒阻塞在select上的读取线程，Linux上使用eventfd，其他平台使用socketpair
+    """
 
-class BaseConnectionPool(object):
     def __init__(self):
-        # 根据远程host保存与此host相关的连接
+        if hasattr(os, 'eventfd'):
+            self.__reader = self.__writer = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+            self.__sockets = None
+        else:
+            reader, writer = socket.socketpair()
+            reader.setblocking(False)
+            writer.setblocking(False)
+            self.__sockets = reader, writer
+            self.__reader, self.__writer = reader.fileno(), writer.fileno()
+
+    def fileno(self):
+        return self.__reader
+
+    def wakeup(self):
+        """
+        唤醒读取线程，多次唤醒在被消费之前会被合并为一次
+        :return:
+        """
+        try:
+            if self.__sockets is None:
+                os.eventfd_write(self.__writer, 1)
+            else:
+                self.__sockets[1].send(b'\x00')
+        except (BlockingIOError, InterruptedError):
+            pass  # 缓冲区已满说明已经有尚未被消费的唤醒
+
+    def consume(self):
+        """
+        消费所有的唤醒信号
+        :return:
+        """
+        try:
+            if self.__sockets is None:
+                os.eventfd_read(self.__reader)
+            else:
+                while self.__sockets[0].recv(4096):
+                    pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def close(self):
+        if self.__sockets is None:
+            os.close(self.__reader)
+        else:
+            for sock in self.__sockets:
+                sock.close()
+
+
+class InvokeHandle(object):
+    """
+    一次已经发送的调用，可以等待其结果或者取消；取消之后等待中的线程立即被唤醒，
+    连接池中为此调用保留的资源立即释放，之后到达的响应不做解析直接丢弃
+    """
+
+    def __init__(self, pool, conn, invoke_id, method_key, timeout):
+        self.host = conn.remote_host()
+        self.invoke_id = invoke_id
+        self.timeout = timeout
+        self.event = threading.Event()
+        # 时间轮中的超时任务
+        self.deadline = None
+        self._pool = pool
+        self._conn = conn
+        self._method_key = method_key
+        self._lock = threading.Lock()
+        self._finished = False
+        self._cancelled = False
+        self._outcome = None
+
+    def result(self):
+        """
+        等待并返回调用的结果，超时抛出DubboRequestTimeoutException，已经取消则抛出DubboRequestCancelledException
+        :return:
+        """
+        timeout = self.timeout
+        try:
+            # 超时由时间轮负责唤醒，这里额外等待两个tick仅作为兜底
+            self.event.wait(None if timeout is None else timeout + 2 * self._pool._timer.tick_duration)
+        finally:
+            claimed = self._finish()
+        if claimed:
+            err = "Socket(host='{}'): Read timed out. (read timeout={})".format(self.host, timeout)
+            # 保存超时作为结果并唤醒event，之后的cancel()和result()不会一直阻塞
+            with self._lock:
+                self._outcome = (DubboRequestTimeoutException(err),)
+            self.event.set()
+            raise self._outcome[0]
+        # 取走event的一方可能尚未来得及唤醒当前线程
+        self.event.wait()
+
+        if self._cancelled:
+            raise DubboRequestCancelledException(
+                "Socket(host='{}'): Request {} cancelled.".format(self.host, self.invoke_id))
+        result = self._take_outcome()
+        if isinstance(result, (DubboRequestTimeoutException, DubboConnectionException)):
+            raise result
+        if isinstance(result, Exception):
+            logger.exception(result)
+            logger.error('Exception {} for host {}'.format(result, self.host))
+            raise result
+        return result
+
+    def cancel(self):
+        """
+        取消此次调用，可以在任意线程中调用
+        :return: 调用已经有了结果（响应、超时或者连接断开）时返回False
+        """
+        if not self._finish():
+            # 已经有结果的调用，把结果从连接池中取走以免无人读取时残留，取走event的一方会立即唤醒event
+            self.event.wait()
+            self._take_outcome()
+            return False
+        self._cancelled = True
+        self._pool._stats['cancelled'] += 1
+        self.event.set()
+        logger.debug('Request cancelled, invoke_id={}, host={}'.format(self.invoke_id, self.host))
+        return True
+
+    def cancelled(self):
+        return self._cancelled
+
+    def _finish(self):
+        """
+        释放此次调用在连接池中占用的资源，只会执行一次
+        :return: 是否由当前线程取走了event，即响应和超时都还没有写入结果
+        """
+        with self._lock:
+            if self._finished:
+                return False
+            self._finished = True
+        self._conn.pending.discard(self.invoke_id)
+        if self.deadline is not None:
+            self.deadline.cancel()
+        self._pool._release(self.host, self._method_key)
+        # 响应、超时和当前调用之间只有取走event的一方可以写入结果
+        return self._pool.conn_events.pop(self.invoke_id, None) is not None
+
+    def _take_outcome(self):
+        with self._lock:
+            if self._outcome is None:
+                self._outcome = (self._pool.results.pop(self.invoke_id, None),)
+            return self._outcome[0]
+
+
+class BaseConnectionPool(object):
+    def __init__(self, connections_per_host=DEFAULT_CONNECTIONS_PER_HOST, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 max_inflight_per_host=None, max_inflight_per_method=None, admission_timeout=0, socket_options=None,
+                 max_connections=DEFAULT_MAX_CONNECTIONS, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        """
+        :param connections_per_host: 每个host最多可以建立的连接数，连接在负载升高时按需创建
+        :param connect_timeout: 建立连接的超时时间（秒），与请求的超时时间相互独立
+        :param max_inflight_per_host: 每个host最多同时在途的请求数，为None时不限制
+        :param max_inflight_per_method: 每个host上的每个方法最多同时在途的请求数，为None时不限制
+        :param admission_timeout: 在途请求数达到上限时排队等待的最长时间（秒），为0时立即拒绝
+        :param socket_options: 新建连接的socket参数，为None时使用默认参数
+        :param max_connections: 连接池最多保持的连接数，超出时关闭最久未使用的空闲连接，为None时不限制
+        :param idle_timeout: 连接最长未被使用的时间（秒），超过之后连接被关闭，为None时不关闭
+        """
+        if connections_per_host < 1:
+            raise ValueError('connections_per_host must be positive, get {}'.format(connections_per_host))
+        self.connections_per_host = connections_per_host
+        self.connect_timeout = connect_timeout
+        self.admission_timeout = admission_timeout
+        self.socket_options = socket_options or SocketOptions()
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        # 连接数超出上限时由读取线程关闭最久未使用的空闲连接
+        self._over_capacity = False
+        # 按照host以及host+方法统计和限制在途的请求数
+        self._host_limiter = InflightLimiter(max_inflight_per_host)
+        self._method_limiter = InflightLimiter(max_inflight_per_method)
+        # 根据远程host保存与此host相关的连接列表，列表只会被整体替换而不会原地修改
         self._connection_pool = {}
         # 用于在多个线程之间保存结果
         self.results = {}
-        # 保存客户端已经发生超时的心跳次数
-        self.client_heartbeats = {}
-        # 创建连接的锁
+        # 每个host正在建立中的连接，同一个host的并发请求共享一次连接，不同host的连接并行建立
+        self._connecting = {}
+        # 保护_connecting的锁，建立连接的过程不在锁内进行
         self.conn_lock = threading.Lock()
+        # 建立连接失败的host：连续失败的次数以及下一次允许重连的时刻
+        self._backoff = {}
         # 用于在数据读取完毕之后唤醒主线程
         self.conn_events = {}
+        # 用于在有新的连接或者监听事件变化时唤醒读取线程
+        self._waker = Waker()
+        # 请求超时的时间轮，由读取线程推进
+        self._timer = HashedWheelTimer()
+        # 超时的请求数、取消的请求数、超时或者取消之后才到达的响应数，以及因为超出连接数上限和空闲超时而关闭的连接数
+        self._stats = {'expired': 0, 'late': 0, 'cancelled': 0, 'evicted_lru': 0, 'evicted_idle': 0}
 
-        reading_thread = threading.Thread(target=self._read_from_server)
-        reading_thread.setDaemon(True)  # 当主线程退出时此线程同时退出
-        reading_thread.start()
+        # 按照下一次心跳检查的时刻排序的连接，由读取线程处理
+        self._heartbeat_queue = []
+        self._heartbeat_seq = itertools.count()
+        self._heartbeat_lock = threading.Lock()
 
-        scanning_thread = threading.Thread(target=self._send_heartbeat)
-        scanning_thread.setDaemon(True)
-        scanning_thread.start()
+        # 连接池开始关闭之后不再接受新的请求，读取线程在_running为False时退出
+        self._closing = False
+        self._close_started = False
+        self._running = True
+        # 读取线程在第一次发起请求时才启动
+        self._reading_thread = None
+        self._start_lock = threading.Lock()
 
     def get(self, host, request_param, timeout=None):
         """
-        执行远程调用获取数据
+        执行远程调用获取数据，在途请求数达到上限时排队等待或者抛出DubboRejectedException
         :param host:
         :param request_param:
         :param timeout:
         :return:
         """
-        conn = self._get_connection(host)
+        return self.submit(host, request_param, timeout).result()
+
+    def submit(self, host, request_param, timeout=None):
+        """
+        发送请求但不等待响应，在途请求数达到上限时排队等待或者抛出DubboRejectedException
+        :param host:
+        :param request_param:
+        :param timeout:
+        :return: InvokeHandle，用于等待结果或者取消此次调用
+        """
+        if self._closing:
+            raise DubboRejectedException('Connection pool is closed')
+        method_key = (host, request_param['method'])
+        # 先占用粒度更细的方法名额，排队等待的请求不会占用host的名额
+        self._method_limiter.acquire(method_key, self.admission_timeout)
+        try:
+            self._host_limiter.acquire(host, self.admission_timeout)
+        except Exception:
+            self._method_limiter.release(method_key)
+            raise
+        try:
+            return self._send(host, method_key, request_param, timeout)
+        except Exception:
+            self._release(host, method_key)
+            raise
+
+    def close(self, drain_timeout=DEFAULT_DRAIN_TIMEOUT):
+        """
+        关闭连接池：立即停止接受新的请求，等待在途的请求完成，超过drain_timeout之后
+        剩余的请求以DubboConnectionException结束，然后关闭所有的连接并停止读取线程
+        :param drain_timeout: 等待在途请求完成的最长时间（秒），为None时一直等待
+        :return:
+        """
+        with self._start_lock:
+            if self._close_started:
+                return
+            self._close_started = True
+            self._closing = True
+        deadline = None if drain_timeout is None else time.time() + drain_timeout
+        while self.conn_events and (deadline is None or time.time() < deadline):
+            time.sleep(0.01)
+
+        self._running = False
+        self._waker.wakeup()
+        if self._reading_thread is not None and self._reading_thread is not threading.current_thread():
+            self._reading_thread.join()
+        for conn in self._connections():
+            self._close_connection(conn, 'Connection pool closed.')
+        # 登记在已经被移除的连接上的请求
+        for invoke_id in list(self.conn_events):
+            self._set_result(invoke_id, DubboConnectionException('Connection pool closed.'))
+        self._release_resources()
+        logger.debug('Connection pool closed.')
+
+    def _release_resources(self):
+        """
+        释放读取线程使用的资源，在读取线程退出之后调用
+        :return:
+        """
+        self._waker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _start(self):
+        """
+        启动读取线程，只会启动一次，连接池关闭之后不再启动
+        :return:
+        """
+        with self._start_lock:
+            if self._reading_thread is not None or self._closing:
+                return
+            # 当主线程退出时此线程同时退出
+            reading_thread = threading.Thread(target=self._read_from_server, daemon=True)
+            reading_thread.start()
+            self._reading_thread = reading_thread
+
+    def connect_first(self, hosts, stagger=DEFAULT_CONNECT_STAGGER):
+        """
+        按照顺序每隔stagger秒向下一个候选host发起连接，返回最先建立好连接的host
+        :param hosts: 按照优先级排列的候选host
+        :param stagger: 启动下一个候选连接之前等待的时间（秒）
+        :return:
+        """
+        return race_connect(self._get_connection, hosts, stagger)
+
+    def configure(self, socket_options):
+        """
+        修改新建连接的socket参数，已经建立的连接不受影响
+        :param socket_options:
+        :return:
+        """
+        self.socket_options = socket_options
+
+    def occupancy(self, host, method=None):
+        """
+        当前在途的请求数
+        :param host:
+        :param method: 为None时返回host上所有方法的在途请求数
+        :return:
+        """
+        if method is None:
+            return self._host_limiter.occupancy(host)
+        return self._method_limiter.occupancy((host, method))
+
+    def _send(self, host, method_key, request_param, timeout):
+        """
+        登记并发送请求，登记之后发生的错误都通过请求的结果返回
+        :param host:
+        :param method_key:
+        :param request_param:
+        :param timeout:
+        :return: InvokeHandle
+        """
         request = Request(request_param)
         request_data = request.encode()
         invoke_id = request.invoke_id
 
-        event = threading.Event()
-        self.conn_events[invoke_id] = event
+        # 先编码再取得连接，缩短连接被取得之后、登记invoke_id之前看起来空闲的时间
+        conn = self._get_connection(host)
+        handle = InvokeHandle(self, conn, invoke_id, method_key, timeout)
+        conn.last_used = time.time()
+        self.conn_events[invoke_id] = handle.event
+        conn.pending.add(invoke_id)
+        if conn.closed:
+            # 连接在取得之后、登记invoke_id之前已经断开，断开连接时的清理不会覆盖到此请求
+            self._set_result(invoke_id, DubboConnectionException(
+                "Socket(host='{}'): Connection closed.".format(host)))
+            return handle
+
+        if timeout is not None:
+            handle.deadline = self._add_timeout(timeout, lambda: self._expire(invoke_id, host, timeout))
         # 发送数据
-        conn.write(request_data)
-        logger.debug('Waiting response, invoke_id={}, timeout={}, host={}'.format(invoke_id, timeout, host))
-        event.wait(timeout)
-        del self.conn_events[invoke_id]
+        try:
+            conn.write(request_data)
+        except OSError as e:
+            self._close_connection(conn, 'Write failed: {}'.format(e))
+        logger.debug('Request sent, invoke_id={}, timeout={}, host={}'.format(invoke_id, timeout, host))
+        return handle
 
-        if invoke_id not in self.results:
-            err = "Socket(host='{}'): Read timed out. (read timeout={})".format(host, timeout)
-            raise DubboRequestTimeoutException(err)
+    def _release(self, host, method_key):
+        """
+        释放一次调用占用的在途请求名额
+        :param host:
+        :param method_key:
+        :return:
+        """
+        self._host_limiter.release(host)
+        self._method_limiter.release(method_key)
+        # 连接数仍然超出上限时唤醒读取线程，关闭刚刚空闲下来的连接
+        if self._over_capacity:
+            self._waker.wakeup()
 
-        result = self.results.pop(invoke_id)
-        if isinstance(result, Exception):
-            logger.exception(result)
-            logger.error('Exception {} for host {}'.format(result, host))
-            raise result
-        return result
+    def stats(self):
+        """
+        连接池的运行统计
+        :return: expired为超时的请求数，late为超时或者取消之后才到达而被丢弃的响应数，cancelled为被取消的请求数，
+                 evicted_lru为超出连接数上限而被关闭的连接数，evicted_idle为空闲超时而被关闭的连接数，
+                 pending为等待响应的请求数，rejected为因为在途请求数达到上限而被拒绝的请求数，connections为当前的连接数
+        """
+        stats = dict(self._stats)
+        stats['connections'] = len(self._connections())
+        stats['pending'] = len(self.conn_events)
+        stats['rejected'] = self._host_limiter.rejected + self._method_limiter.rejected
+        return stats
+
+    def _add_timeout(self, delay, callback):
+        """
+        向时间轮中添加一个定时任务
+        :param delay:
+        :param callback:
+        :return:
+        """
+        idle = not self._timer
+        timeout = self._timer.add(delay, callback)
+        # 时间轮为空时读取线程可能正阻塞在较长的select超时上，需要唤醒它按照tick推进时间轮
+        if idle:
+            self._waker.wakeup()
+        return timeout
+
+    def _select_timeout(self):
+        """
+        读取线程每一轮select的超时时间：时间轮中有任务时不超过下一个tick，
+        并且不超过下一次心跳检查；连接数超出上限时每个tick重新尝试关闭空闲连接；都没有时一直阻塞到被唤醒
+        :return:
+        """
+        timeouts = [t for t in (self._timer.next_timeout(), self._next_heartbeat()) if t is not None]
+        if self._over_capacity:
+            timeouts.append(self._timer.tick_duration)
+        return min(timeouts) if timeouts else None
+
+    def _expire(self, invoke_id, host, timeout):
+        """
+        请求超时，由时间轮在读取线程中调用
+        :param invoke_id:
+        :param host:
+        :param timeout:
+        :return:
+        """
+        err = "Socket(host='{}'): Read timed out. (read timeout={})".format(host, timeout)
+        if self._set_result(invoke_id, DubboRequestTimeoutException(err)):
+            self._stats['expired'] += 1
+
+    def _set_result(self, invoke_id, result):
+        """
+        写入请求的结果并唤醒请求线程
+        :param invoke_id:
+        :param result:
+        :return: 请求已经超时或者已经有结果时返回False
+        """
+        event = self.conn_events.pop(invoke_id, None)
+        if event is None:
+            return False
+        self.results[invoke_id] = result
+        event.set()
+        logger.debug('Event set, invoked_id={}'.format(invoke_id))
+        return True
 
     def _get_connection(self, host):
         """
-        通过host获取到与此host相关的socket，本地会对socket进行缓存
+        通过host获取到与此host相关的socket，本地会对socket进行缓存；
+        同一个host有多个连接时选择在途请求最少的连接，所有连接都繁忙且
+        未达到连接数上限时创建新的连接，已有连接可用时新的连接在后台建立，调用方直接使用已有的连接；
+        host处于重连退避期间并且没有可用的连接时直接抛出DubboConnectionException
         :param host:
         :return:
         """
         if not host or ':' not in host:
             raise ValueError('invalid host {}'.format(host))
-        if host not in self._connection_pool:
-            self.conn_lock.acquire()
-            try:
-                if host not in self._connection_pool:
-                    self.client_heartbeats[host] = 0
-                    self._new_connection(host)
-            finally:
-                self.conn_lock.release()
-        return self._connection_pool[host]
+        conn = self._least_pending_connection(host)
+        if conn is not None and (not conn.pending or self._is_full(host)):
+            return conn
 
-    def _new_connection(self, host):
+        with self.conn_lock:
+            # 其他线程可能已经创建了新的连接，需要重新检查
+            conn = self._least_pending_connection(host)
+            if conn is not None and (not conn.pending or self._is_full(host)):
+                return conn
+            future = self._connecting.get(host)
+            if future is None:
+                backoff = self._backoff.get(host)
+                if backoff is not None and backoff[1] > time.time():
+                    if conn is not None:
+                        return conn
+                    raise DubboConnectionException("Socket(host='{}'): Reconnect backing off for {:.3f}s after {} "
+                                                   "failures.".format(host, backoff[1] - time.time(), backoff[0]))
+                future = Future()
+                self._connecting[host] = future
+                connecting = True
+            else:
+                connecting = False
+
+        if connecting and conn is not None:
+            # 已有的连接只是繁忙，新连接的建立不占用调用方的时间，建立失败也只记录退避状态
+            thread = threading.Thread(target=self._establish_connection, args=(host, future), daemon=True)
+            thread.start()
+            return conn
+        if not connecting:
+            # 此host已经有连接正在建立，存在可用的连接时直接使用，否则等待连接建立完成
+            if conn is not None:
+                return conn
+            return future.result()
+
+        self._establish_connection(host, future)
+        return future.result()
+
+    def _establish_connection(self, host, future):
+        """
+        建立一个新的连接，结果写入future，并根据结果更新host的重连退避状态
+        :param host:
+        :param future: 已经登记在self._connecting中的Future
+        :return:
+        """
+        try:
+            future.set_result(self._new_connection(host))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self.conn_lock:
+                del self._connecting[host]
+                self._update_backoff(host, future.exception() is None)
+
+    def _update_backoff(self, host, connected):
         """
-        创建一个新的连接
+        根据建立连接的结果更新host的重连退避状态，连续失败时退避时间按指数增长并加入随机抖动，
+        避免大量客户端在同一时刻重连
         :param host:
+        :param connected: 是否成功建立了连接
         :return:
         """
+        if connected:
+            self._backoff.pop(host, None)
+            return
+        failures = self._backoff[host][0] + 1 if host in self._backoff else 1
+        delay = min(RECONNECT_BACKOFF_MAX, RECONNECT_BACKOFF_BASE * 2 ** (failures - 1))
+        delay = random.uniform(delay / 2, delay)
+        self._backoff[host] = (failures, time.time() + delay)
+        logger.debug('Connect to {} failed {} times, retry after {:.3f}s'.format(host, failures, delay))
+
+    def _least_pending_connection(self, host):
+        """
+        获取host下在途请求最少的连接，host没有连接时返回None
+        :param host:
+        :return:
+        """
+        conns = self._connection_pool.get(host)
+        if not conns:
+            return None
+        return min(conns, key=lambda c: len(c.pending))
+
+    def _is_full(self, host):
+        return len(self._connection_pool.get(host, ())) >= self.connections_per_host
+
+    def _connections(self):
+        """
+        获取所有连接的快照
+        :return:
+        """
+        return [conn for conns in list(self._connection_pool.values()) for conn in conns]
+
+    def _add_connection(self, host, conn):
+        """
+        把一个连接加入到连接池中
+        :param host:
+        :param conn:
+        :return:
+        """
+        self._connection_pool[host] = self._connection_pool.get(host, []) + [conn]
+        if self._reading_thread is None:
+            self._start()
+        due = conn.last_active + TIMEOUT_IDLE
+        if self.idle_timeout is not None:
+            due = min(due, conn.last_used + self.idle_timeout)
+        self._schedule_heartbeat(conn, due)
+        if self.max_connections is not None and len(self._connections()) > self.max_connections:
+            self._over_capacity = True
+
+    def _remove_connection(self, conn):
+        """
+        把一个连接从连接池中移除
+        :param conn:
+        :return:
+        """
+        host = conn.remote_host()
+        conns = [c for c in self._connection_pool.get(host, []) if c is not conn]
+        if conns:
+            self._connection_pool[host] = conns
+        else:
+            self._connection_pool.pop(host, None)
+
+    def _new_connection(self, host):
+        """
+        创建一个新的连接，开始监听其读事件并加入到连接池中
+        :param host:
+        :return: 新的连接
+        """
         raise NotImplementedError()
 
+    def _connect(self, host):
+        """
+        与远程主机建立连接
+        :param host:
+        :return:
+        """
+        family, ip, port = parse_host(host)
+        return Connection(ip, port, self.connect_timeout, self.socket_options, family)
+
     def _delete_connection(self, conn):
         """
         移除一个连接
@@ -122,6 +652,20 @@ class BaseConnectionPool(object):
         """
         raise NotImplementedError()
 
+    def _close_connection(self, conn, reason):
+        """
+        移除并关闭一个连接，此连接上所有等待响应的请求立即以DubboConnectionException结束，
+        而不是一直等待到超时
+        :param conn:
+        :param reason: 连接关闭的原因
+        :return:
+        """
+        self._delete_connection(conn)
+        conn.close()
+        host = conn.remote_host()
+        for invoke_id in list(conn.pending):
+            self._set_result(invoke_id, DubboConnectionException("Socket(host='{}'): {}".format(host, reason)))
+
     def _read_from_server(self):
         """
         管理读取所有远程主机的数据
@@ -149,7 +693,7 @@ class BaseConnectionPool(object):
         # 关闭连接
         if not data:
             logger.debug('{} closed by remote server.'.format(host))
-            self._delete_connection(conn)
+            self._close_connection(conn, 'Connection closed by remote server.')
             return 0, 0, 0
 
         # 响应的头部
@@ -159,10 +703,8 @@ class BaseConnectionPool(object):
         # 错误的响应体
         elif data_type == 2:
             logger.debug('received error response body with invoke_id={}, host={}'.format(invoke_id, host))
-            res = Response(data)
-            error = res.read_next()
-            self.results[invoke_id] = DubboResponseException('\n{}'.format(error))
-            self.conn_events[invoke_id].set()
+            if invoke_id not in self.conn_events or not self._set_result(invoke_id, parse_error_body(data)):
+                self._drop_late_response(invoke_id)
             return DEFAULT_READ_PARAMS
         # 正常的响应体
         elif data_type == 3:
@@ -196,8 +738,7 @@ class BaseConnectionPool(object):
             return body_length, 3, None if body_length > 0 else DEFAULT_READ_PARAMS
         elif heartbeat == 1:
             logger.debug('❤ response -> {}'.format(conn.remote_host()))
-            host = conn.remote_host()
-            self.client_heartbeats[host] -= 1
+            conn.heartbeats -= 1
             return body_length, 3, None if body_length > 0 else DEFAULT_READ_PARAMS
 
         # 普通的数据包
@@ -216,81 +757,127 @@ class BaseConnectionPool(object):
         if invoke_id is None:
             return
 
-        try:
-            res = Response(body)
-            flag = res.read_int()
-            if flag == 2:  # 响应的值为NULL
-                self.results[invoke_id] = None
-            elif flag == 1:  # 正常的响应值
-                result = res.read_next()
-                self.results[invoke_id] = result
-            elif flag == 0:  # 异常的响应值
-                self.results[invoke_id] = self._parse_error(res)
-            else:
-                raise DubboResponseException("Unknown result flag, expect '0' '1' '2', get " + str(flag))
-        except Exception as e:
-            logger.exception(e)
-            self.results[invoke_id] = e
-        finally:
-            self.conn_events[invoke_id].set()  # 唤醒请求线程
-            logger.debug('Event set, invoked_id={}'.format(invoke_id))
+        # 已经超时的请求的响应直接丢弃，不再对body做解析
+        if invoke_id not in self.conn_events or not self._set_result(invoke_id, parse_response_body(body)):
+            self._drop_late_response(invoke_id)
 
-    @staticmethod
-    def _parse_error(res):
+    def _drop_late_response(self, invoke_id):
+        self._stats['late'] += 1
+        logger.debug('Drop late response, invoke_id={}'.format(invoke_id))
+
+    def _schedule_heartbeat(self, conn, due):
         """
-        对Java的异常错误信息进行解析
-        :param res:
+        安排在due时刻对连接进行心跳检查
+        :param conn:
+        :param due:
         :return:
         """
-        err = res.read_error()
-        error = '\n{cause}: {detailMessage}\n'.format(**err)
-        stack_trace = err['stackTrace']
-        for trace in stack_trace:
-            error += '	at {declaringClass}.{methodName}({fileName}:{lineNumber})\n'.format(**trace)
-        return DubboResponseException(error)
+        with self._heartbeat_lock:
+            heapq.heappush(self._heartbeat_queue, (due, next(self._heartbeat_seq), conn))
+
+    def _next_heartbeat(self):
+        """
+        距离下一次心跳检查的时间，没有连接时返回None
+        :return:
+        """
+        with self._heartbeat_lock:
+            if not self._heartbeat_queue:
+                return None
+            return max(0, self._heartbeat_queue[0][0] - time.time())
 
     def _send_heartbeat(self):
         """
-        客户端发送心跳消息
+        在读取线程中执行所有已经到期的心跳检查，并安排下一次检查
         :return:
         """
-        while 1:
-            starting = time.time()
-            for host in self._connection_pool.keys():
-                try:
-                    self._check_conn(host)
-                except Exception as e:
-                    logger.exception(e)
-            ending = time.time()
-            time_delta = ending - starting
-            if time_delta < TIMEOUT_CHECK_INTERVAL:
-                time.sleep(TIMEOUT_CHECK_INTERVAL - time_delta)
+        now = time.time()
+        due_conns = []
+        with self._heartbeat_lock:
+            while self._heartbeat_queue and self._heartbeat_queue[0][0] <= now:
+                due_conns.append(heapq.heappop(self._heartbeat_queue)[2])
 
-    def _check_conn(self, host):
+        for conn in due_conns:
+            # 已经被移除的连接不再检查
+            if conn not in self._connection_pool.get(conn.remote_host(), ()):
+                continue
+            try:
+                due = self._check_conn(conn)
+            except Exception as e:
+                logger.exception(e)
+                due = now + TIMEOUT_CHECK_INTERVAL
+            if due is not None:
+                self._schedule_heartbeat(conn, due)
+
+    def _evict_connections(self):
         """
-        对连接进行检查，查看是否超时或者已经达到最大的超时次数
-        :param host:
+        连接数超出上限时，在读取线程中关闭最久未使用的空闲连接；
+        空闲连接不足时暂时允许超出上限，保留标记直到有调用结束之后再次尝试
         :return:
         """
-        conn = self._connection_pool[host]
-        # 如果未达到最大的超时时间，则不进行任何操作
-        if time.time() - conn.last_active <= TIMEOUT_IDLE:
+        if not self._over_capacity:
             return
+        # 先清除标记再取快照，其他线程此后新增的连接会重新设置标记
+        self._over_capacity = False
+        conns = self._connections()
+        excess = len(conns) - self.max_connections
+        # 刚刚建立或者刚刚被取得的连接可能还没有登记请求，至少一个tick未被使用才视为空闲
+        idle_before = time.time() - self._timer.tick_duration
+        idle_conns = sorted((conn for conn in conns if not conn.pending and conn.last_used < idle_before),
+                            key=lambda c: c.last_used)
+        for conn in idle_conns[:excess]:
+            self._stats['evicted_lru'] += 1
+            self._close_connection(conn, 'Evicted as least recently used.')
+            logger.debug('{} evicted as least recently used.'.format(conn.remote_host()))
+        if excess > len(idle_conns):
+            self._over_capacity = True
 
-        # 达到最大的超时次数，对此连接进行重连
-        if self.client_heartbeats[host] >= TIMEOUT_MAX_TIMES:
-            self._new_connection(host)
-            self.client_heartbeats[host] = 0
-            conn.close()  # 关闭旧的连接
-            logger.debug('{} timeout and reconnected by client.'.format(host))
+    def _check_conn(self, conn):
+        """
+        对连接进行检查，关闭空闲超时的连接，并在连接长时间没有数据往来时发送心跳
+        :param conn:
+        :return: 下一次检查的时刻，连接被关闭时返回None
+        """
+        if self.idle_timeout is None:
+            return self._check_heartbeat(conn)
 
-        # 未达到最大的超时次数，超时次数+1且发送心跳包
+        now = time.time()
+        if conn.pending:
+            # 有在途请求的连接不会被关闭，稍后再检查
+            idle_due = now + self.idle_timeout
         else:
-            self.client_heartbeats[host] += 1
-            invoke_id = get_invoke_id()
-            req = CLI_HEARTBEAT_REQ_HEAD + list(bytearray(pack('!q', invoke_id))) + CLI_HEARTBEAT_TAIL
-            conn.write(bytearray(req))
-            logger.debug('Send ❤ request for invoke_id {}, host={}'.format(invoke_id, host))
+            idle_due = conn.last_used + self.idle_timeout
+            if now >= idle_due:
+                self._stats['evicted_idle'] += 1
+                self._close_connection(conn, 'Idle timeout.')
+                logger.debug('{} unused for {}s and closed by client.'.format(conn.remote_host(), self.idle_timeout))
+                return None
+        due = self._check_heartbeat(conn)
+        return None if due is None else min(due, idle_due)
+
+    def _check_heartbeat(self, conn):
+        """
+        对连接进行检查，查看是否超时或者已经达到最大的超时次数
+        :param conn:
+        :return: 下一次检查的时刻，连接被关闭时返回None
+        """
+        host = conn.remote_host()
+        # 如果未达到最大的超时时间，则在连接空闲达到超时时间时再检查
+        if time.time() - conn.last_active <= TIMEOUT_IDLE:
+            return conn.last_active + TIMEOUT_IDLE
+
+        # 达到最大的超时次数，关闭此连接，下一次请求时会重新建立连接
+        if conn.heartbeats >= TIMEOUT_MAX_TIMES:
+            self._close_connection(conn, 'Heartbeat timed out.')
+            logger.debug('{} timeout and closed by client.'.format(host))
+            return None
+
+        # 未达到最大的超时次数，超时次数+1且发送心跳包
+        conn.heartbeats += 1
+        invoke_id = get_invoke_id()
+        req = CLI_HEARTBEAT_REQ_HEAD + list(bytearray(pack('!q', invoke_id))) + CLI_HEARTBEAT_TAIL
+        conn.write(bytearray(req))
+        logger.debug('Send ❤ request for invoke_id {}, host={}'.format(invoke_id, host))
+        return time.time() + TIMEOUT_CHECK_INTERVAL
 
 
 class SelectConnectionPool(BaseConnectionPool):
@@ -298,40 +885,355 @@ class SelectConnectionPool(BaseConnectionPool):
     select模型支持大多数的现代操作系统
     """
 
-    def __init__(self):
-        self.select_timeout = 0.5  # select模型超时时间
-        BaseConnectionPool.__init__(self)
+    def __init__(self, **kwargs):
+        BaseConnectionPool.__init__(self, **kwargs)
 
     def _read_from_server(self):
-        while True:
+        while self._running:
+            conns = self._connections()
+            writers = [conn for conn in conns if conn.want_write()]
             try:
-                conns = self._connection_pool.values()
-                conns = list(conns)
-                if len(conns) == 0:
-                    time.sleep(0.5)
+                readable, writeable, exceptional = select.select(
+                    conns + [self._waker], writers, [], self._select_timeout())
+            except (select.error, ValueError) as e:
+                # 快照中的连接可能已经被其他线程移除并关闭，下一轮的快照中不会再包含它
+                if any(conn.closed for conn in conns):
                     continue
-                readable, writeable, exceptional = select.select(conns, [], [], self.select_timeout)
-            except select.error as e:
                 logger.exception(e)
-                break
+                # 持续的错误（例如fd超出FD_SETSIZE）重试也无法恢复，关闭出错的连接；找不到出错的连接时退出
+                if not self._close_unselectable(conns, e):
+                    break
+                continue
+            if self._waker in readable:
+                readable.remove(self._waker)
+                self._waker.consume()
+            for conn in writeable:
+                try:
+                    conn.flush()
+                except OSError as e:
+                    self._close_connection(conn, 'Write failed: {}'.format(e))
+                except Exception as e:
+                    logger.exception(e)
             for conn in readable:
+                if conn.closed:
+                    continue
                 try:
                     conn.read(self._callback)
                 except Exception as e:
                     logger.exception(e)
+            self._timer.advance()
+            self._send_heartbeat()
+            self._evict_connections()
+
+    def _close_unselectable(self, conns, error):
+        """
+        逐个检查连接能否被select，关闭不能被select的连接，其上等待响应的请求立即失败
+        :param conns:
+        :param error: select抛出的异常
+        :return: 被关闭的连接
+        """
+        unselectable = []
+        for conn in conns:
+            try:
+                select.select([conn], [], [], 0)
+            except (select.error, ValueError):
+                unselectable.append(conn)
+        for conn in unselectable:
+            self._close_connection(conn, 'Select failed: {}'.format(error))
+        return unselectable
 
     def _new_connection(self, host):
-        ip, port = host.split(':')
-        self._connection_pool[host] = Connection(ip, int(port))
-        # 保证select模型已经开始监听最新加入的这个fd的读事件，否则可能会导致此fd读事件丢失
-        time.sleep(self.select_timeout)
+        conn = self._connect(host)
+        conn.write_interest_callback = self._set_write_interest
+        self._add_connection(host, conn)
+        # 唤醒select，使其立即开始监听最新加入的这个fd的读事件
+        self._waker.wakeup()
+        return conn
+
+    def _set_write_interest(self, conn, enabled):
+        """
+        发送缓冲区非空时唤醒select，使其在下一轮循环中监听此连接的写事件
+        :param conn:
+        :param enabled:
+        :return:
+        """
+        if enabled:
+            self._waker.wakeup()
 
     def _delete_connection(self, conn):
-        del self._connection_pool[conn.remote_host()]
+        self._remove_connection(conn)
+
 
+class SelectorsConnectionPool(BaseConnectionPool):
+    """
+    基于selectors模块的连接池，Linux上为epoll，其他平台自动选择最优实现；
+    连接在创建和移除时增量注册到selector中，不再受FD_SETSIZE的限制
+    """
 
-# connection_pool在整个进程中是单例的
-connection_pool = SelectConnectionPool()
+    def __init__(self, **kwargs):
+        self._selector = selectors.DefaultSelector()
+        # selector的注册、修改和注销在多个线程中发生，需要加锁
+        self._selector_lock = threading.Lock()
+        BaseConnectionPool.__init__(self, **kwargs)
+        self._selector.register(self._waker, selectors.EVENT_READ)
+
+    def _read_from_server(self):
+        while self._running:
+            try:
+                events = self._selector.select(self._select_timeout())
+            except (OSError, ValueError) as e:
+                logger.exception(e)
+                break
+            for key, mask in events:
+                conn = key.fileobj
+                if conn is self._waker:
+                    self._waker.consume()
+                    continue
+                if mask & selectors.EVENT_WRITE:
+                    try:
+                        conn.flush()
+                    except OSError as e:
+                        self._close_connection(conn, 'Write failed: {}'.format(e))
+                    except Exception as e:
+                        logger.exception(e)
+                if mask & selectors.EVENT_READ and not conn.closed:
+                    try:
+                        conn.read(self._callback)
+                    except Exception as e:
+                        logger.exception(e)
+            self._timer.advance()
+            self._send_heartbeat()
+            self._evict_connections()
+
+    def _new_connection(self, host):
+        conn = self._connect(host)
+        conn.write_interest_callback = self._set_write_interest
+        with self._selector_lock:
+            self._selector.register(conn, selectors.EVENT_READ)
+        self._add_connection(host, conn)
+        # epoll在注册之后立即生效，其他基于快照的selector实现则需要唤醒之后才能监听到新的fd
+        self._waker.wakeup()
+        return conn
+
+    def _set_write_interest(self, conn, enabled):
+        """
+        开始或停止监听一个连接的写事件
+        :param conn:
+        :param enabled:
+        :return:
+        """
+        events = selectors.EVENT_READ | selectors.EVENT_WRITE if enabled else selectors.EVENT_READ
+        with self._selector_lock:
+            try:
+                self._selector.modify(conn, events)
+            except (KeyError, ValueError):
+                return  # 连接已经被注销
+        if enabled:
+            self._waker.wakeup()
+
+    def _delete_connection(self, conn):
+        # 连接关闭之后其fd可能会被新连接复用，必须在关闭之前注销
+        with self._selector_lock:
+            self._unregister(conn)
+        self._remove_connection(conn)
+
+    def _release_resources(self):
+        BaseConnectionPool._release_resources(self)
+        self._selector.close()
+
+    def _unregister(self, conn):
+        """
+        从selector中注销一个连接，连接未注册时忽略
+        :param conn:
+        :return:
+        """
+        try:
+            self._selector.unregister(conn)
+        except (KeyError, ValueError):
+            pass
+
+
+class ShardedConnectionPool(object):
+    """
+    由多个reactor分片组成的连接池，host按照哈希固定分配到其中一个分片，
+    每个分片拥有各自的读取线程、selector、超时时间轮和心跳检查，
+    一个host上较大的响应体在解码时不会阻塞其他分片上的host
+    """
+
+    def __init__(self, shards=DEFAULT_REACTOR_SHARDS, pool_class=None, max_connections=DEFAULT_MAX_CONNECTIONS,
+                 **kwargs):
+        """
+        :param shards: 分片数
+        :param pool_class: 每个分片的连接池类型，默认Linux上使用epoll
+        :param max_connections: 所有分片总共最多保持的连接数，平均分配到每个分片，为None时不限制
+        :param kwargs: 传给每个分片的连接池的参数
+        """
+        if shards < 1:
+            raise ValueError('shards must be positive, get {}'.format(shards))
+        if pool_class is None:
+            pool_class = SelectorsConnectionPool if is_linux() else SelectConnectionPool
+        if max_connections is not None:
+            max_connections = max(1, -(-max_connections // shards))
+        self._shards = [pool_class(max_connections=max_connections, **kwargs) for _ in range(shards)]
+
+    def shard(self, host):
+        """
+        获取host所在的分片，同一个host始终分配到同一个分片
+        :param host:
+        :return:
+        """
+        return self._shards[zlib.crc32(host.encode('utf-8')) % len(self._shards)]
+
+    def get(self, host, request_param, timeout=None):
+        """
+        执行远程调用获取数据
+        :param host:
+        :param request_param:
+        :param timeout:
+        :return:
+        """
+        return self.shard(host).get(host, request_param, timeout)
+
+    def submit(self, host, request_param, timeout=None):
+        """
+        发送请求但不等待响应
+        :param host:
+        :param request_param:
+        :param timeout:
+        :return: InvokeHandle
+        """
+        return self.shard(host).submit(host, request_param, timeout)
+
+    def close(self, drain_timeout=DEFAULT_DRAIN_TIMEOUT):
+        """
+        关闭所有的分片，所有分片同时停止接受新的请求，并共享同一个等待期限
+        :param drain_timeout: 等待在途请求完成的最长时间（秒），为None时一直等待
+        :return:
+        """
+        for shard in self._shards:
+            shard._closing = True
+        deadline = None if drain_timeout is None else time.time() + drain_timeout
+        for shard in self._shards:
+            shard.close(None if deadline is None else max(0, deadline - time.time()))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def connect_first(self, hosts, stagger=DEFAULT_CONNECT_STAGGER):
+        """
+        按照顺序每隔stagger秒向下一个候选host发起连接，返回最先建立好连接的host
+        :param hosts: 按照优先级排列的候选host
+        :param stagger: 启动下一个候选连接之前等待的时间（秒）
+        :return:
+        """
+        return race_connect(lambda host: self.shard(host)._get_connection(host), hosts, stagger)
+
+    def configure(self, socket_options):
+        """
+        修改所有分片新建连接的socket参数
+        :param socket_options:
+        :return:
+        """
+        for shard in self._shards:
+            shard.configure(socket_options)
+
+    def occupancy(self, host, method=None):
+        return self.shard(host).occupancy(host, method)
+
+    def stats(self):
+        """
+        所有分片的运行统计之和
+        :return:
+        """
+        stats = {}
+        for shard in self._shards:
+            for key, value in shard.stats().items():
+                stats[key] = stats.get(key, 0) + value
+        return stats
+
+
+def race_connect(get_connection, hosts, stagger):
+    """
+    错开时间地向多个候选host建立连接，返回最先建立好连接的host：首选host已经有连接时直接返回，
+    否则每隔stagger秒或者在前一个候选失败时立即启动下一个候选；
+    落后的连接在后台继续建立，建立成功之后保留在连接池中供之后使用
+    :param get_connection: 获取或者建立host连接的函数
+    :param hosts: 按照优先级排列的候选host
+    :param stagger:
+    :return: 所有候选都失败时抛出最后一个异常
+    """
+    if not hosts:
+        raise ValueError('no candidate hosts')
+    results = queue.Queue()
+
+    def connect(host):
+        try:
+            get_connection(host)
+            results.put((host, None))
+        except Exception as e:
+            results.put((host, e))
+
+    started = 0
+    failed = 0
+    while True:
+        if started < len(hosts):
+            thread = threading.Thread(target=connect, args=(hosts[started],))
+            thread.daemon = True
+            thread.start()
+            started += 1
+        try:
+            host, error = results.get(timeout=stagger if started < len(hosts) else None)
+        except queue.Empty:
+            continue  # 当前的候选还没有建立好连接，启动下一个候选
+        if error is None:
+            logger.debug('Connected to {} first among {}'.format(host, hosts))
+            return host
+        failed += 1
+        logger.debug('Connect to {} failed: {}'.format(host, error))
+        if failed == len(hosts):
+            raise error
+
+
+# 进程中单例的连接池，由多个reactor分片组成，Linux上每个分片使用epoll；
+# 在第一次使用时才创建，导入此模块不会启动任何线程
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
+
+
+def get_connection_pool():
+    """
+    获取进程中单例的连接池，不存在则创建
+    :return:
+    """
+    global _connection_pool
+    if _connection_pool is None:
+        with _connection_pool_lock:
+            if _connection_pool is None:
+                _connection_pool = ShardedConnectionPool()
+    return _connection_pool
+
+
+def close_connection_pool(drain_timeout=DEFAULT_DRAIN_TIMEOUT):
+    """
+    关闭单例的连接池，尚未创建时不做任何操作
+    :param drain_timeout: 等待在途请求完成的最长时间（秒）
+    :return:
+    """
+    global _connection_pool
+    with _connection_pool_lock:
+        pool, _connection_pool = _connection_pool, None
+    if pool is not None:
+        pool.close(drain_timeout)
+
+
+def __getattr__(name):
+    # 兼容通过connection_pool直接使用单例连接池的代码
+    if name == 'connection_pool':
+        return get_connection_pool()
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
 
 
 class Connection(object):
@@ -339,17 +1241,44 @@ class Connection(object):
     对Socket链接做了一些封装
     """
 
-    def __init__(self, host, port):
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(5)
-        sock.connect((host, port))
+    def __init__(self, host, port, connect_timeout=DEFAULT_CONNECT_TIMEOUT, socket_options=None,
+                 family=socket.AF_INET):
+        """
+        :param host: ip，或者Unix domain socket的文件路径
+        :param port: Unix domain socket的端口为None
+        :param connect_timeout:
+        :param socket_options:
+        :param family: socket的地址族，AF_INET、AF_INET6或者AF_UNIX
+        """
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            (socket_options or SocketOptions()).apply(sock)
+            sock.settimeout(connect_timeout)
+            sock.connect(host if port is None else (host, port))
+        except OSError:
+            sock.close()
+            raise
         # 在创建好连接之后设置IO为非阻塞
         sock.setblocking(False)
         self.__sock = sock
-        self.__host = '{0}:{1}'.format(host, port)
+        self.__host = format_host(family, host, port)
 
         self.read_length, self.read_type, self.invoke_id = DEFAULT_READ_PARAMS
-        self.read_buffer = []
+        # 预先分配的读缓冲区，以及当前帧已经读取到的字节数
+        self.read_view = memoryview(bytearray(READ_BUFFER_SIZE))
+        self.read_received = 0
+        # 此连接上尚未收到响应的invoke_id
+        self.pending = set()
+        # 已经发生超时的心跳次数
+        self.heartbeats = 0
+        # 连接是否已经关闭
+        self.closed = False
+        # 最近一次发送请求的时刻，心跳不计算在内
+        self.last_used = time.time()
+        # 尚未发送完毕的数据，以及发送缓冲区在空与非空之间切换时的回调
+        self.write_lock = threading.Lock()
+        self.write_buffer = deque()
+        self.write_interest_callback = None
 
         self.last_active = time.time()
 
@@ -363,22 +1292,75 @@ class Connection(object):
 
     def write(self, data):
         """
-        向远程主机写数据
+        向远程主机写数据，此方法不会阻塞：发送缓冲区为空时直接尝试发送，
+        未能写完的部分以及发送缓冲区非空时写入的数据都进入发送缓冲区，
+        由连接池在socket可写时合并为一次系统调用发送
+        :param data:
         :return:
         """
-        while 1:
+        with self.write_lock:
+            if self.write_buffer:
+                self.write_buffer.append(data)
+                return
             try:
                 length = self.__sock.send(data)
-                if length == len(data):
-                    break
-                else:
-                    # 截取尚未写完的数据，接下来再次发送
-                    data = data[length:]
-            except socket.error as e:
-                if e.errno == 35:
-                    time.sleep(.01)
-                else:
-                    raise
+            except BlockingIOError:
+                length = 0
+            if length < len(data):
+                # 截取尚未写完的数据，等待socket可写时再次发送
+                self.write_buffer.append(memoryview(data)[length:])
+                self._on_write_interest(True)
+
+    def flush(self):
+        """
+        在socket可写时由连接池调用，把发送缓冲区中的数据合并发送
+        :return:
+        """
+        with self.write_lock:
+            while self.write_buffer:
+                try:
+                    if _HAS_SENDMSG:
+                        length = self.__sock.sendmsg(list(islice(self.write_buffer, SENDMSG_MAX_BUFFERS)))
+                    else:
+                        data = b''.join(self.write_buffer)
+                        self.write_buffer.clear()
+                        self.write_buffer.append(data)
+                        length = self.__sock.send(data)
+                except BlockingIOError:
+                    return
+                self._consume_write_buffer(length)
+            self._on_write_interest(False)
+
+    def _consume_write_buffer(self, length):
+        """
+        从发送缓冲区中移除已经发送完毕的数据
+        :param length: 已经发送的字节数
+        :return:
+        """
+        while length > 0:
+            data = self.write_buffer[0]
+            if len(data) > length:
+                self.write_buffer[0] = memoryview(data)[length:]
+                return
+            length -= len(data)
+            self.write_buffer.popleft()
+
+    def want_write(self):
+        """
+        发送缓冲区中是否还有等待发送的数据
+        :return:
+        """
+        return bool(self.write_buffer)
+
+    def _on_write_interest(self, enabled):
+        """
+        发送缓冲区在空与非空之间切换时通知连接池修改对写事件的监听，
+        调用时持有write_lock，保证监听状态与发送缓冲区保持一致
+        :param enabled:
+        :return:
+        """
+        if self.write_interest_callback is not None:
+            self.write_interest_callback(self, enabled)
 
     def read(self, callback):
         """
@@ -388,25 +1370,27 @@ class Connection(object):
         """
         self.last_active = time.time()
         try:
-            data = list(bytearray(self.__sock.recv(self.read_length - len(self.read_buffer))))
-            # data = self.__sock.recv(1024)
+            self._ensure_buffer()
+            # 直接把数据读取到缓冲区中，不产生中间的bytes对象
+            length = self.__sock.recv_into(self.read_view[self.read_received:self.read_length])
             # 断开连接
-            if not data:
+            if not length:
                 callback([], self, None, None)
                 return
 
-            self.read_buffer.extend(data)
-            # 数据读取已经满足要求
-            if len(self.read_buffer) == self.read_length:
+            self.read_received += length
+            # 数据读取已经满足要求，把缓冲区的切片交给回调函数，回调函数不能在返回之后继续持有此切片
+            if self.read_received == self.read_length:
+                self.read_received = 0
                 self.read_length, self.read_type, self.invoke_id \
-                    = callback(bytearray(self.read_buffer), self, self.read_type, self.invoke_id)
-                self.read_buffer = []
-        except BlockingIOError as e:
-            # Windows平台上非阻塞socket在没有数据时会抛出此异常，属于正常情况
-            if e.errno == 10035:  # WSAEWOULDBLOCK
-                pass
-            else:
-                raise
+                    = callback(self.read_view[:self.read_length], self, self.read_type, self.invoke_id)
+        except BlockingIOError:
+            # 非阻塞socket在没有数据时会抛出此异常（EAGAIN/WSAEWOULDBLOCK），属于正常情况
+            pass
+        except ConnectionError as e:
+            # 连接被重置等错误与对端正常关闭一样处理
+            logger.debug('{} read error: {}'.format(self.__host, e))
+            callback([], self, None, None)
         except socket.error as e:
             # 兼容其他可能的socket错误
             if hasattr(e, 'errno') and e.errno == 10035:  # WSAEWOULDBLOCK
@@ -414,13 +1398,33 @@ class Connection(object):
             else:
                 raise
 
+    def _ensure_buffer(self):
+        """
+        保证读缓冲区能够容纳下一帧数据；缓冲区不足时重新分配而不是原地扩容，
+        大的响应读取完毕之后恢复为默认大小，避免空闲连接长期占用大块内存
+        :return:
+        """
+        size = len(self.read_view)
+        if self.read_length > size:
+            new_buffer = bytearray(max(self.read_length, size * 2))
+            new_buffer[:self.read_received] = self.read_view[:self.read_received]
+            self.read_view = memoryview(new_buffer)
+        elif size > READ_BUFFER_SIZE and self.read_received == 0 and self.read_length <= READ_BUFFER_SIZE:
+            self.read_view = memoryview(bytearray(READ_BUFFER_SIZE))
+
     def close(self):
         """
         关闭连接
         :return:
         """
+        if self.closed:
+            return
+        self.closed = True
         logger.debug('{} closed by client.'.format(self.__host))
-        self.__sock.shutdown(socket.SHUT_RDWR)
+        try:
+            self.__sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # 对端已经关闭连接
         self.__sock.close()
 
     def remote_host(self):
@@ -428,3 +1432,4 @@ class Connection(object):
 
     def __repr__(self):
         return self.__host
+
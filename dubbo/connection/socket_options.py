@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import logging
+import socket
+
+logger = logging.getLogger('python-dubbo')
+
+# macOS上空闲时间的选项名为TCP_KEEPALIVE
+_TCP_KEEPIDLE = getattr(socket, 'TCP_KEEPIDLE', getattr(socket, 'TCP_KEEPALIVE', None))
+
+
+class SocketOptions(object):
+    """
+    连接的socket参数，在建立连接之前设置到socket上
+    """
+
+    def __init__(self, tcp_nodelay=True, keepalive=False, keepalive_idle=None, keepalive_interval=None,
+                 keepalive_count=None, rcvbuf=None, sndbuf=None):
+        """
+        :param tcp_nodelay: 是否关闭Nagle算法，dubbo的请求帧通常很小，默认关闭以降低延迟
+        :param keepalive: 是否开启TCP keepalive，由内核探测已经失效的对端
+        :param keepalive_idle: 连接空闲多少秒之后开始发送keepalive探测，为None时使用系统默认值
+        :param keepalive_interval: keepalive探测的间隔（秒），为None时使用系统默认值
+        :param keepalive_count: 连续多少次探测失败之后断开连接，为None时使用系统默认值
+        :param rcvbuf: 接收缓冲区大小（字节），为None时使用系统默认值
+        :param sndbuf: 发送缓冲区大小（字节），为None时使用系统默认值
+        """
+        for name, value in (('keepalive_idle', keepalive_idle), ('keepalive_interval', keepalive_interval),
+                            ('keepalive_count', keepalive_count), ('rcvbuf', rcvbuf), ('sndbuf', sndbuf)):
+            if value is not None and value <= 0:
+                raise ValueError('{} must be positive, get {}'.format(name, value))
+        self.tcp_nodelay = tcp_nodelay
+        self.keepalive = keepalive
+        self.keepalive_idle = keepalive_idle
+        self.keepalive_interval = keepalive_interval
+        self.keepalive_count = keepalive_count
+        self.rcvbuf = rcvbuf
+        self.sndbuf = sndbuf
+
+    @classmethod
+    def from_credentials(cls, credentials):
+        """
+        根据插件的预授权配置创建socket参数，未配置的字段使用默认值
+        :param credentials: 所有的值都可以是字符串
+        :return:
+        """
+        return cls(
+            tcp_nodelay=_parse_bool(credentials, 'tcp_nodelay', True),
+            keepalive=_parse_bool(credentials, 'tcp_keepalive', False),
+            keepalive_idle=_parse_int(credentials, 'tcp_keepalive_idle'),
+            keepalive_interval=_parse_int(credentials, 'tcp_keepalive_interval'),
+            keepalive_count=_parse_int(credentials, 'tcp_keepalive_count'),
+            rcvbuf=_parse_int(credentials, 'socket_rcvbuf'),
+            sndbuf=_parse_int(credentials, 'socket_sndbuf'),
+        )
+
+    def apply(self, sock):
+        """
+        把参数设置到socket上，缓冲区大小需要在连接建立之前设置才能影响TCP的窗口协商；
+        当前平台不支持的keepalive参数以及Unix domain socket上的TCP参数会被忽略
+        :param sock:
+        :return:
+        """
+        if self.rcvbuf is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+        if self.sndbuf is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf)
+        # Unix domain socket没有TCP层的参数
+        if sock.family not in (socket.AF_INET, socket.AF_INET6):
+            return
+        if self.tcp_nodelay:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.keepalive:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            for option, value in ((_TCP_KEEPIDLE, self.keepalive_idle),
+                                  (getattr(socket, 'TCP_KEEPINTVL', None), self.keepalive_interval),
+                                  (getattr(socket, 'TCP_KEEPCNT', None), self.keepalive_count)):
+                if value is None:
+                    continue
+                if option is None:
+                    logger.debug('TCP keepalive option is not supported on this platform, ignored')
+                    continue
+                sock.setsockopt(socket.IPPROTO_TCP, option, value)
+
+    def __repr__(self):
+        return 'SocketOptions({})'.format(', '.join('{}={}'.format(k, v) for k, v in sorted(vars(self).items())))
+
+
+def _parse_bool(credentials, name, default):
+    value = credentials.get(name)
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in ('true', '1', 'yes', 'on'):
+        return True
+    if value in ('false', '0', 'no', 'off'):
+        return False
+    raise ValueError('Invalid {} value: {}. Must be true or false'.format(name, credentials.get(name)))
+
+
+def _parse_int(credentials, name):
+    value = credentials.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid {} value: {}. Must be a positive integer'.format(name, credentials.get(name)))
+    if value <= 0:
+        raise ValueError('Invalid {} value: {}. Must be a positive integer'.format(name, value))
+    return value
@@ -1,10 +1,16 @@
 import logging
 from dify_plugin import Plugin, DifyPluginEnv
 
+from dubbo.connection.connections import close_connection_pool
+
 # 设置日志级别为debug
 logging.basicConfig(level=logging.DEBUG)
 
 plugin = Plugin(DifyPluginEnv(MAX_REQUEST_TIMEOUT=120))
 
 if __name__ == '__main__':
-    plugin.run()
+    try:
+        plugin.run()
+    finally:
+        # 插件退出时等待在途的调用完成，并正常关闭所有连接
+        close_connection_pool()
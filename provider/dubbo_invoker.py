@@ -3,6 +3,8 @@ import re
 
 from dify_plugin import ToolProvider
 
+from dubbo.connection.socket_options import SocketOptions
+
 
 class DubboInvokerProvider(ToolProvider):
     def _validate_credentials(self, credentials: dict[str, Any]) -> None:
@@ -30,4 +32,17 @@ class DubboInvokerProvider(ToolProvider):
             except ValueError as e:
                 if "invalid literal" in str(e):
                     raise ValueError(f"Invalid timeout value: {timeout}. Must be a positive integer in milliseconds")
-                raise e 
\ No newline at end of file
+                raise e
+
+        # 验证连接竞速的间隔
+        connect_stagger = credentials.get('connect_stagger')
+        if connect_stagger:
+            try:
+                stagger_value = int(connect_stagger)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid connect_stagger value: {connect_stagger}. Must be a non-negative integer in milliseconds")
+            if stagger_value < 0:
+                raise ValueError("connect_stagger must be a non-negative integer")
+
+        # 验证socket参数
+        SocketOptions.from_credentials(credentials) 
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""
+基于asyncio的客户端测试，使用本地模拟的dubbo服务端
+"""
+import asyncio
+import socket
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dubbo.client import AsyncDubboClient
+from dubbo.common.exceptions import DubboRequestTimeoutException
+from tests.fake_provider import FakeProvider
+
+
+def test_async_client_concurrent_calls():
+    """同一个事件循环上可以同时发起大量调用，并且共享一个连接"""
+    provider = FakeProvider(delay=0.05)
+    try:
+        async def run():
+            client = AsyncDubboClient('com.example.DemoService', host=provider.host)
+            return await asyncio.gather(*[client.call('echo', [i], timeout=5) for i in range(200)])
+
+        assert asyncio.run(run()) == list(range(200))
+        assert provider.connections == 1
+    finally:
+        provider.close()
+
+
+def test_async_client_timeout():
+    """超时的请求抛出超时异常"""
+    provider = FakeProvider(delay=0.5)
+    try:
+        async def run():
+            client = AsyncDubboClient('com.example.DemoService', host=provider.host)
+            await client.call('echo', ['slow'], timeout=0.1)
+
+        try:
+            asyncio.run(run())
+            assert False, 'should raise DubboRequestTimeoutException'
+        except DubboRequestTimeoutException:
+            pass
+    finally:
+        provider.close()
+
+
+def test_async_client_unix_socket():
+    """异步客户端同样可以通过Unix domain socket调用"""
+    if not hasattr(socket, 'AF_UNIX'):
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        provider = FakeProvider(unix_path=os.path.join(directory, 'dubbo.sock'))
+        try:
+            async def run():
+                client = AsyncDubboClient('com.example.DemoService', host=provider.host)
+                return await client.call('echo', ['unix'], timeout=5)
+
+            assert asyncio.run(run()) == 'unix'
+        finally:
+            provider.close()
+
+
+if __name__ == '__main__':
+    test_async_client_concurrent_calls()
+    test_async_client_timeout()
+    test_async_client_unix_socket()
+    print('异步客户端测试完成')
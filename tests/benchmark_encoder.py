@@ -0,0 +1,79 @@
+"""
+统计请求编码的吞吐量以及编码过程中的内存分配
+
+分别对小请求和数MB参数的大请求进行编码，输出每秒编码的字节数、每个请求的耗时，
+以及编码一个请求时tracemalloc记录到的峰值内存与编码结果大小之比（即每个输出字节伴随的临时分配）
+
+运行方式：python tests/benchmark_encoder.py
+"""
+import sys
+import os
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dubbo.codec.encoder import Request, Object
+from tests.connection_pool_test import build_request
+
+
+def small_request():
+    user = Object('com.example.User', {'name': 'bob', 'age': 18, 'score': 99.5})
+    return build_request('save', [user, 'hello world', 12345, [1, 2, 3]])
+
+
+def large_string_request():
+    return build_request('upload', ['x' * (4 * 1024 * 1024)])
+
+
+def large_text_request():
+    return build_request('upload', [(u'中文文本，包含emoji \U0001f600 ' * 50000)[:1024 * 1024]])
+
+
+def large_list_request():
+    return build_request('sum', [list(range(1000000))])
+
+
+def large_objects_request():
+    return build_request('saveAll', [[Object('com.example.User', {'name': 'user{}'.format(i), 'age': i})
+                                      for i in range(100000)]])
+
+
+CASES = [
+    ('small', small_request, 20000),
+    ('4MB string', large_string_request, 5),
+    ('1M-char text', large_text_request, 5),
+    ('1M int list', large_list_request, 3),
+    ('100K objects', large_objects_request, 3),
+]
+
+
+def measure_peak(request):
+    """
+    :return: 编码一个请求期间的峰值内存（字节）
+    """
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    Request(request).encode()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    print('{:<14} {:>12} {:>12} {:>14} {:>12} {:>10}'.format(
+        'case', 'bytes', 'per request', 'throughput', 'peak', 'peak/size'))
+    for name, factory, rounds in CASES:
+        request = factory()
+        size = len(Request(request).encode())
+        start = time.perf_counter()
+        for _ in range(rounds):
+            Request(request).encode()
+        elapsed = (time.perf_counter() - start) / rounds
+        peak = measure_peak(request)
+        print('{:<14} {:>12} {:>10.3f}ms {:>10.1f}MB/s {:>10.1f}KB {:>10.1f}'.format(
+            name, size, elapsed * 1000, size / elapsed / 1024 / 1024, peak / 1024, peak / size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+统计插件入口以及主要模块在全新解释器中的导入耗时和导入之后的线程数，用于防止冷启动变慢
+
+每个模块在独立的子进程中导入多次，取中位数，并扣除空解释器的启动耗时；
+缺少依赖（例如dify_plugin）的模块会被跳过
+
+运行方式：python tests/benchmark_import.py
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 7
+MODULES = ['dubbo.connection.connections', 'dubbo.client', 'utils.dubbo_utils', 'provider.dubbo_invoker',
+           'tools.dubbo_invoke', 'main']
+
+CODE = '''
+import threading
+import time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, threading.active_count())
+'''
+
+
+def measure(module):
+    """
+    :return: (导入耗时的中位数（秒）, 导入之后的线程数)，导入失败时返回错误信息
+    """
+    samples = []
+    threads = None
+    for _ in range(RUNS):
+        proc = subprocess.run([sys.executable, '-c', CODE.format(module=module)], cwd=ROOT,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        if proc.returncode != 0:
+            return proc.stderr.strip().splitlines()[-1]
+        elapsed, threads = proc.stdout.split()
+        samples.append(float(elapsed))
+    samples.sort()
+    return samples[len(samples) // 2], int(threads)
+
+
+def main():
+    for module in MODULES:
+        result = measure(module)
+        if isinstance(result, str):
+            print('{:<32} skipped: {}'.format(module, result))
+        else:
+            print('{:<32} {:>8.1f}ms  threads={}'.format(module, result[0] * 1000, result[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+统计1MB、10MB和50MB的JSON文本以及二进制数据作为参数时的编码耗时和内存占用，
+并通过本地模拟的服务端完成一次完整的调用
+
+峰值内存与请求大小之比接近1说明编码过程中除了请求本身之外只有块大小的临时数据
+
+运行方式：python tests/benchmark_large_payload.py
+"""
+import sys
+import os
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dubbo.codec.encoder import Request
+from dubbo.connection.connections import SelectorsConnectionPool
+from tests.connection_pool_test import build_request
+from tests.fake_provider import FakeProvider
+
+SIZES = [1, 10, 50]
+RECORD = u'{"id": 12345, "name": "商品名称", "tags": ["a", "b"], "note": "emoji \U0001f600"},'
+
+
+def json_document(size):
+    """生成大约size MB的JSON文本"""
+    count = size * 1024 * 1024 // len(RECORD.encode('utf-8'))
+    return u'[' + RECORD * count + u'{}]'
+
+
+def binary_file(size):
+    return os.urandom(size * 1024 * 1024)
+
+
+def measure(payload):
+    """
+    :return: (请求大小, 编码耗时, 编码期间的峰值内存)
+    """
+    request = build_request('upload', [payload])
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    size = len(Request(request).encode())
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    # tracemalloc本身会拖慢编码，单独再计时一次
+    start = time.perf_counter()
+    Request(request).encode()
+    elapsed = min(elapsed, time.perf_counter() - start)
+    return size, elapsed, peak
+
+
+def main():
+    provider = FakeProvider(handler=lambda method, args: len(args[0]))
+    try:
+        with SelectorsConnectionPool() as pool:
+            print('{:<12} {:>12} {:>10} {:>12} {:>10} {:>10}'.format(
+                'payload', 'bytes', 'encode', 'throughput', 'peak/size', 'call'))
+            for size in SIZES:
+                for name, factory in (('JSON', json_document), ('binary', binary_file)):
+                    payload = factory(size)
+                    request_size, elapsed, peak = measure(payload)
+                    start = time.perf_counter()
+                    assert pool.get(provider.host, build_request('upload', [payload]), 300) == len(payload)
+                    call = time.perf_counter() - start
+                    print('{:<12} {:>12} {:>8.0f}ms {:>8.1f}MB/s {:>10.2f} {:>8.2f}s'.format(
+                        '{}MB {}'.format(size, name), request_size, elapsed * 1000,
+                        request_size / elapsed / 1024 / 1024, peak / request_size, call))
+    finally:
+        provider.close()
+
+
+if __name__ == '__main__':
+    main()
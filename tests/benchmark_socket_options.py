@@ -0,0 +1,70 @@
+"""
+对比开启和关闭TCP_NODELAY时小请求的调用延迟
+
+多个线程在同一个连接上并发发送小请求，关闭TCP_NODELAY时后发出的请求帧
+会被Nagle算法滞留到前一个数据包被确认之后才发送
+
+运行方式：python tests/benchmark_socket_options.py
+"""
+import sys
+import os
+import socket
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dubbo.connection.connections import SelectorsConnectionPool
+from dubbo.connection.socket_options import SocketOptions
+from tests.connection_pool_test import build_request
+from tests.fake_provider import FakeProvider
+
+THREADS = 8
+REQUESTS_PER_THREAD = 50
+# 服务端处理每个请求的耗时，期间服务端的TCP延迟确认会使客户端后续的小包被Nagle算法滞留
+SERVICE_TIME = 0.005
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run(provider, socket_options):
+    with SelectorsConnectionPool(connections_per_host=1, socket_options=socket_options) as pool:
+        pool.get(provider.host, build_request('echo', ['warm']), 5)
+        latencies = []
+
+        def invoke():
+            for i in range(REQUESTS_PER_THREAD):
+                start = time.perf_counter()
+                pool.get(provider.host, build_request('echo', [i]), 5)
+                latencies.append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=invoke) for _ in range(THREADS)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies
+
+
+def main():
+    provider = FakeProvider(delay=SERVICE_TIME)
+    # 服务端同样关闭Nagle算法，使结果只反映客户端的差异；Linux上监听socket的此选项会被accept的连接继承
+    provider._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    try:
+        for name, options in (('TCP_NODELAY off', SocketOptions(tcp_nodelay=False)),
+                              ('TCP_NODELAY on', SocketOptions(tcp_nodelay=True))):
+            elapsed, latencies = run(provider, options)
+            print('{:<16} {:>6} calls in {:.2f}s, p50={:.2f}ms p99={:.2f}ms max={:.2f}ms'.format(
+                name, len(latencies), elapsed, percentile(latencies, 0.5) * 1000,
+                percentile(latencies, 0.99) * 1000, max(latencies) * 1000))
+    finally:
+        provider.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+对比通过本地回环TCP与Unix domain socket调用同一台机器上服务端的延迟
+
+运行方式：python tests/benchmark_transports.py
+"""
+import sys
+import os
+import socket
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dubbo.connection.connections import SelectorsConnectionPool
+from tests.connection_pool_test import build_request
+from tests.fake_provider import FakeProvider
+
+REQUESTS = 2000
+PAYLOAD = 'x' * 1024
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run(provider):
+    with SelectorsConnectionPool(connections_per_host=1) as pool:
+        pool.get(provider.host, build_request('echo', ['warm']), 5)
+        latencies = []
+        for _ in range(REQUESTS):
+            start = time.perf_counter()
+            pool.get(provider.host, build_request('echo', [PAYLOAD]), 5)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        providers = [('loopback TCP', FakeProvider())]
+        if hasattr(socket, 'AF_UNIX'):
+            providers.append(('Unix socket', FakeProvider(unix_path=os.path.join(directory, 'dubbo.sock'))))
+        try:
+            for name, provider in providers:
+                latencies = run(provider)
+                print('{:<14} {:>6} calls, p50={:.3f}ms p99={:.3f}ms'.format(
+                    name, len(latencies), percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000))
+        finally:
+            for _, provider in providers:
+                provider.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,730 @@
+"""
+连接池测试，使用本地模拟的dubbo服务端，不依赖真实的Java服务
+"""
+import sys
+import os
+import select
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import types
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dubbo.common.constants import READ_BUFFER_SIZE
+from dubbo.common.exceptions import DubboRequestTimeoutException, DubboRejectedException, \
+    DubboConnectionException, DubboRequestCancelledException
+from dubbo.common.util import parse_host
+from dubbo.connection import connections
+from dubbo.connection.connections import SelectorsConnectionPool, SelectConnectionPool, ShardedConnectionPool
+from dubbo.connection.socket_options import SocketOptions
+from tests.fake_provider import FakeProvider
+
+
+def build_request(method, args):
+    return {
+        'dubbo_version': '2.4.10',
+        'version': '',
+        'path': 'com.example.DemoService',
+        'method': method,
+        'arguments': args,
+        'context': None
+    }
+
+
+def test_selectors_pool_invoke():
+    """selectors连接池可以完成正常的调用"""
+    provider = FakeProvider()
+    try:
+        pool = SelectorsConnectionPool()
+        assert pool.get(provider.host, build_request('sayHello', ['bob']), 5) == 'bob'
+        assert pool.get(provider.host, build_request('getName', []), 5) == 'getName'
+    finally:
+        provider.close()
+
+
+def test_select_pool_invoke():
+    """select连接池依然可以在其他平台上使用"""
+    provider = FakeProvider()
+    try:
+        pool = SelectConnectionPool()
+        assert pool.get(provider.host, build_request('sayHello', [1]), 5) == 1
+    finally:
+        provider.close()
+
+
+def test_select_pool_persistent_error(monkeypatch):
+    """某个连接持续导致select出错（例如fd超出FD_SETSIZE）时只关闭此连接，读取线程不会空转"""
+    good, bad = FakeProvider(), FakeProvider(delay=0.5)
+    calls = []
+
+    def fake_select(rlist, wlist, xlist, timeout=None):
+        calls.append(timeout)
+        if any(getattr(conn, 'remote_host', lambda: None)() == bad.host for conn in rlist):
+            raise ValueError('filedescriptor out of range in select()')
+        return select.select(rlist, wlist, xlist, timeout)
+
+    monkeypatch.setattr(connections, 'select', types.SimpleNamespace(select=fake_select, error=select.error))
+    try:
+        pool = SelectConnectionPool()
+        assert pool.get(good.host, build_request('echo', [1]), 5) == 1
+        start = time.time()
+        with pytest.raises(DubboConnectionException):
+            pool.get(bad.host, build_request('echo', [2]), 5)
+        assert time.time() - start < 0.3
+        del calls[:]
+        time.sleep(0.3)
+        assert len(calls) < 20
+        assert pool.get(good.host, build_request('echo', [3]), 5) == 3
+        assert pool._reading_thread.is_alive()
+    finally:
+        good.close()
+        bad.close()
+
+
+def test_parse_host():
+    """host可以是IPv4、带方括号的IPv6地址或者Unix domain socket的路径"""
+    assert parse_host('127.0.0.1:20880') == (socket.AF_INET, '127.0.0.1', 20880)
+    assert parse_host('[::1]:20880') == (socket.AF_INET6, '::1', 20880)
+    if hasattr(socket, 'AF_UNIX'):
+        assert parse_host('unix:/var/run/dubbo.sock') == (socket.AF_UNIX, '/var/run/dubbo.sock', None)
+    for host in ('127.0.0.1', '::1:20880', '[::1]', '127.0.0.1:0', '127.0.0.1:abc', 'unix:'):
+        with pytest.raises(ValueError):
+            parse_host(host)
+
+
+def test_ipv6_transport():
+    """通过IPv6地址连接服务端"""
+    try:
+        provider = FakeProvider(host='::1')
+    except OSError:
+        pytest.skip('IPv6 is not available')
+    try:
+        for pool_class in (SelectorsConnectionPool, SelectConnectionPool):
+            with pool_class() as pool:
+                assert pool.get(provider.host, build_request('echo', ['v6']), 5) == 'v6'
+                assert repr(pool._connection_pool[provider.host][0]) == provider.host
+    finally:
+        provider.close()
+
+
+def test_unix_transport(monkeypatch):
+    """通过Unix domain socket连接服务端，TCP层的socket参数被忽略，心跳同样有效"""
+    if not hasattr(socket, 'AF_UNIX'):
+        pytest.skip('Unix domain socket is not supported')
+    monkeypatch.setattr(connections, 'TIMEOUT_IDLE', 0.2)
+    with tempfile.TemporaryDirectory() as directory:
+        provider = FakeProvider(unix_path=os.path.join(directory, 'dubbo.sock'))
+        try:
+            for pool_class in (SelectorsConnectionPool, SelectConnectionPool):
+                options = SocketOptions(tcp_nodelay=True, keepalive=True, keepalive_idle=10)
+                with pool_class(socket_options=options) as pool:
+                    assert pool.get(provider.host, build_request('echo', ['unix']), 5) == 'unix'
+                    assert repr(pool._connection_pool[provider.host][0]) == provider.host
+                    heartbeats = provider.heartbeats
+                    time.sleep(0.5)
+                    assert provider.heartbeats > heartbeats
+                    assert len(pool._connection_pool[provider.host]) == 1
+        finally:
+            provider.close()
+
+
+def test_selectors_pool_many_hosts():
+    """一个连接池可以同时保持多个服务端的连接"""
+    providers = [FakeProvider() for _ in range(8)]
+    try:
+        pool = SelectorsConnectionPool()
+        results = {}
+
+        def invoke(provider):
+            results[provider.host] = pool.get(provider.host, build_request('echo', [provider.host]), 5)
+
+        threads = [threading.Thread(target=invoke, args=(provider,)) for provider in providers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == {provider.host: provider.host for provider in providers}
+    finally:
+        for provider in providers:
+            provider.close()
+
+
+def test_connections_grow_under_load():
+    """并发请求时按需为同一个host创建连接，并且不超过连接数上限"""
+    provider = FakeProvider(delay=0.2)
+    try:
+        pool = SelectorsConnectionPool(connections_per_host=3)
+        assert pool.get(provider.host, build_request('echo', ['warm']), 5) == 'warm'
+        assert provider.connections == 1
+
+        threads = [threading.Thread(target=pool.get, args=(provider.host, build_request('echo', [i]), 5))
+                   for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert provider.connections == 3
+        assert len(pool._connection_pool[provider.host]) == 3
+    finally:
+        provider.close()
+
+
+def test_large_response():
+    """大于读缓冲区的响应可以被完整读取，读取完毕后缓冲区恢复默认大小"""
+    provider = FakeProvider(handler=lambda method, args: list(range(args[0])))
+    try:
+        pool = SelectorsConnectionPool()
+        assert pool.get(provider.host, build_request('range', [100000]), 30) == list(range(100000))
+        assert pool.get(provider.host, build_request('range', [3]), 5) == [0, 1, 2]
+        conn = pool._connection_pool[provider.host][0]
+        assert len(conn.read_view) == READ_BUFFER_SIZE
+    finally:
+        provider.close()
+
+
+def test_large_request():
+    """超出socket发送缓冲区的请求由连接池在可写时继续发送"""
+    provider = FakeProvider(handler=lambda method, args: len(args[0]))
+    try:
+        for pool in (SelectorsConnectionPool(), SelectConnectionPool()):
+            assert pool.get(provider.host, build_request('size', [list(range(200000))]), 30) == 200000
+    finally:
+        provider.close()
+
+
+def test_large_string_request():
+    """超过65535个字符的字符串分块编码之后可以被服务端完整解析"""
+    provider = FakeProvider(handler=lambda method, args: args[0])
+    try:
+        pool = SelectorsConnectionPool()
+        text = u'{"key": "中文\U0001f600"}' * 10000
+        assert pool.get(provider.host, build_request('echo', [text]), 30) == text
+        assert pool.get(provider.host, build_request('echo', [b'\x00' * 100000]), 30) == b'\x00' * 100000
+    finally:
+        provider.close()
+
+
+def test_first_call_not_delayed():
+    """新建的连接通过唤醒通道立即被监听，首次调用不再额外等待select超时"""
+    provider = FakeProvider()
+    try:
+        for pool in (SelectorsConnectionPool(), SelectConnectionPool()):
+            start = time.time()
+            assert pool.get(provider.host, build_request('echo', ['first']), 5) == 'first'
+            assert time.time() - start < 0.5
+    finally:
+        provider.close()
+
+
+def test_parallel_connects():
+    """缓慢的host不会阻塞其他host建立连接，同一个host的并发请求只建立一次连接"""
+    provider = FakeProvider(delay=0.1)
+    try:
+        pool = SelectorsConnectionPool(connections_per_host=1)
+        connect = pool._connect
+        connects = []
+
+        def slow_connect(host):
+            connects.append(host)
+            if host == '127.0.0.2:1':
+                time.sleep(1)
+                raise socket.timeout('timed out')
+            time.sleep(0.1)
+            return connect(host)
+
+        pool._connect = slow_connect
+        slow = threading.Thread(target=lambda: pytest.raises(socket.timeout, pool.get, '127.0.0.2:1',
+                                                              build_request('echo', [0]), 5))
+        slow.start()
+        time.sleep(0.05)
+        start = time.time()
+        threads = [threading.Thread(target=pool.get, args=(provider.host, build_request('echo', [i]), 5))
+                   for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert time.time() - start < 0.8
+        assert connects.count(provider.host) == 1
+        slow.join()
+    finally:
+        provider.close()
+
+
+def test_connect_first():
+    """首选host迟迟连不上时错开时间连接下一个候选，使用先连上的host，落后的连接保留在连接池中"""
+    slow_provider = FakeProvider()
+    fast_provider = FakeProvider()
+    try:
+        with SelectorsConnectionPool(connections_per_host=1) as pool:
+            connect = pool._connect
+
+            def slow_connect(host):
+                if host == slow_provider.host:
+                    time.sleep(0.5)
+                return connect(host)
+
+            pool._connect = slow_connect
+            start = time.time()
+            assert pool.connect_first([slow_provider.host, fast_provider.host], 0.1) == fast_provider.host
+            assert time.time() - start < 0.4
+            assert pool.get(fast_provider.host, build_request('echo', ['fast']), 5) == 'fast'
+            time.sleep(0.6)
+            assert pool.stats()['connections'] == 2
+            assert slow_provider.connections == 1
+            # 已经有连接的首选host直接返回
+            assert pool.connect_first([slow_provider.host, fast_provider.host], 0.1) == slow_provider.host
+    finally:
+        slow_provider.close()
+        fast_provider.close()
+
+
+def test_connect_first_failover():
+    """候选连接失败时立即启动下一个候选，所有候选都失败时抛出异常"""
+    provider = FakeProvider()
+    dead = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    dead.bind(('127.0.0.1', 0))
+    dead_host = '127.0.0.1:{}'.format(dead.getsockname()[1])
+    dead.close()
+    try:
+        with ShardedConnectionPool(shards=2, connections_per_host=1) as pool:
+            start = time.time()
+            assert pool.connect_first([dead_host, provider.host], 5) == provider.host
+            assert time.time() - start < 1
+            with pytest.raises(DubboConnectionException):
+                pool.connect_first([dead_host], 5)
+    finally:
+        provider.close()
+
+
+def test_late_response_dropped():
+    """超时之后才到达的响应被直接丢弃，不会残留在连接池中"""
+    provider = FakeProvider(delay=0.3)
+    try:
+        pool = SelectorsConnectionPool()
+        with pytest.raises(DubboRequestTimeoutException):
+            pool.get(provider.host, build_request('echo', ['slow']), 0.1)
+        time.sleep(0.4)
+        assert pool.stats() == {'expired': 1, 'late': 1, 'cancelled': 0, 'evicted_lru': 0, 'evicted_idle': 0,
+                                'connections': 1, 'pending': 0, 'rejected': 0}
+        assert not pool.results
+    finally:
+        provider.close()
+
+
+def test_inflight_limit():
+    """在途请求数达到上限时，排队等待的请求在名额释放之后执行，超出等待时间的请求被拒绝"""
+    provider = FakeProvider(delay=0.2)
+    try:
+        pool = SelectorsConnectionPool(max_inflight_per_method=2, admission_timeout=0.3)
+        results = []
+
+        def invoke(method, i):
+            try:
+                results.append(pool.get(provider.host, build_request(method, [i]), 5))
+            except DubboRejectedException:
+                results.append('rejected')
+
+        threads = [threading.Thread(target=invoke, args=('echo', i)) for i in range(6)]
+        threads.append(threading.Thread(target=invoke, args=('other', 'other')))
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        assert pool.occupancy(provider.host, 'echo') == 2
+        assert pool.occupancy(provider.host) == 3
+        for thread in threads:
+            thread.join()
+        assert results.count('rejected') == 2
+        assert 'other' in results
+        assert pool.occupancy(provider.host) == 0
+        assert pool.stats()['rejected'] == 2
+    finally:
+        provider.close()
+
+
+def test_disconnect_fails_pending():
+    """服务端断开连接时，等待响应的请求立即失败而不是等待到超时"""
+    provider = FakeProvider(delay=5)
+    try:
+        for pool in (SelectorsConnectionPool(), SelectConnectionPool()):
+            threading.Timer(0.2, provider.drop_connections).start()
+            start = time.time()
+            with pytest.raises(DubboConnectionException):
+                pool.get(provider.host, build_request('echo', ['lost']), 30)
+            assert time.time() - start < 1
+            assert provider.host not in pool._connection_pool
+    finally:
+        provider.close()
+
+
+def test_reconnect_backoff(monkeypatch):
+    """建立连接失败之后，退避期间的请求直接失败，退避结束之后才会重新建立连接"""
+    monkeypatch.setattr(connections, 'RECONNECT_BACKOFF_BASE', 0.2)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    host = '127.0.0.1:{}'.format(sock.getsockname()[1])
+    sock.close()
+
+    pool = SelectorsConnectionPool()
+    connect = pool._connect
+    connects = []
+
+    def counting_connect(h):
+        connects.append(h)
+        return connect(h)
+
+    pool._connect = counting_connect
+    with pytest.raises(ConnectionRefusedError):
+        pool.get(host, build_request('echo', [0]), 5)
+    with pytest.raises(DubboConnectionException):
+        pool.get(host, build_request('echo', [0]), 5)
+    assert len(connects) == 1
+    time.sleep(0.25)
+    with pytest.raises(ConnectionRefusedError):
+        pool.get(host, build_request('echo', [0]), 5)
+    assert len(connects) == 2
+    assert pool._backoff[host][0] == 2
+
+
+def test_grow_connect_failure_uses_existing(monkeypatch):
+    """已有连接繁忙时新增连接失败，请求依然通过已有的连接完成，并且记录退避状态"""
+    provider = FakeProvider(delay=0.3)
+    try:
+        pool = SelectorsConnectionPool(connections_per_host=2)
+        first = pool.submit(provider.host, build_request('echo', [1]), 5)
+
+        def failing_connect(host):
+            time.sleep(0.2)
+            raise ConnectionRefusedError('refused')
+
+        monkeypatch.setattr(pool, '_connect', failing_connect)
+        start = time.time()
+        second = pool.submit(provider.host, build_request('echo', [2]), 5)
+        # 新连接在后台建立，调用方不需要等待
+        assert time.time() - start < 0.1
+        assert first.result() == 1 and second.result() == 2
+        assert pool._backoff[provider.host][0] == 1
+        assert len(pool._connection_pool[provider.host]) == 1
+    finally:
+        provider.close()
+
+
+def _getsockopt(pool, host, level, option):
+    conn = pool._connection_pool[host][0]
+    sock = socket.fromfd(conn.fileno(), socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        return sock.getsockopt(level, option)
+    finally:
+        sock.close()
+
+
+def test_socket_options():
+    """新建的连接默认开启TCP_NODELAY，并且按照配置设置keepalive和缓冲区大小"""
+    provider = FakeProvider()
+    try:
+        pool = SelectorsConnectionPool()
+        assert pool.get(provider.host, build_request('echo', [1]), 5) == 1
+        assert _getsockopt(pool, provider.host, socket.IPPROTO_TCP, socket.TCP_NODELAY)
+        assert not _getsockopt(pool, provider.host, socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+
+        pool = SelectorsConnectionPool()
+        pool.configure(SocketOptions(tcp_nodelay=False, keepalive=True, keepalive_idle=30, keepalive_count=4,
+                                     rcvbuf=128 * 1024))
+        assert pool.get(provider.host, build_request('echo', [2]), 5) == 2
+        assert not _getsockopt(pool, provider.host, socket.IPPROTO_TCP, socket.TCP_NODELAY)
+        assert _getsockopt(pool, provider.host, socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+        # Linux会把设置的缓冲区大小翻倍
+        assert _getsockopt(pool, provider.host, socket.SOL_SOCKET, socket.SO_RCVBUF) >= 128 * 1024
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            assert _getsockopt(pool, provider.host, socket.IPPROTO_TCP, socket.TCP_KEEPIDLE) == 30
+            assert _getsockopt(pool, provider.host, socket.IPPROTO_TCP, socket.TCP_KEEPCNT) == 4
+    finally:
+        provider.close()
+
+
+def test_socket_options_from_credentials():
+    """预授权配置中的socket参数都是可选的字符串"""
+    options = SocketOptions.from_credentials({'timeout': '60000'})
+    assert options.tcp_nodelay and not options.keepalive and options.rcvbuf is None
+
+    options = SocketOptions.from_credentials({'tcp_nodelay': 'false', 'tcp_keepalive': True,
+                                              'tcp_keepalive_idle': '30', 'socket_sndbuf': '65536'})
+    assert not options.tcp_nodelay and options.keepalive
+    assert options.keepalive_idle == 30 and options.sndbuf == 65536
+
+    for credentials in ({'tcp_keepalive_idle': '0'}, {'socket_rcvbuf': 'abc'}, {'tcp_nodelay': 'maybe'}):
+        with pytest.raises(ValueError):
+            SocketOptions.from_credentials(credentials)
+
+
+def test_sharded_pool():
+    """host按照哈希固定分配到一个分片，一个分片的读取线程被阻塞时其他分片上的host不受影响"""
+    providers = [FakeProvider() for _ in range(6)]
+    try:
+        pool = ShardedConnectionPool(shards=3)
+        for provider in providers:
+            assert pool.get(provider.host, build_request('echo', [provider.host]), 5) == provider.host
+            assert provider.host in pool.shard(provider.host)._connection_pool
+        assert sum(len(shard._connection_pool) for shard in pool._shards) == len(providers)
+
+        slow = providers[0]
+        blocked_shard = pool.shard(slow.host)
+        while all(pool.shard(provider.host) is blocked_shard for provider in providers):
+            providers.append(FakeProvider())
+        fast = next(provider for provider in providers if pool.shard(provider.host) is not blocked_shard)
+
+        release = threading.Event()
+        parse_response = blocked_shard._parse_response
+
+        def blocking_parse_response(invoke_id, body):
+            release.wait(5)
+            parse_response(invoke_id, body)
+
+        blocked_shard._parse_response = blocking_parse_response
+        slow_call = threading.Thread(target=pool.get, args=(slow.host, build_request('echo', ['slow']), 10))
+        slow_call.start()
+        time.sleep(0.1)
+        start = time.time()
+        assert pool.get(fast.host, build_request('echo', ['fast']), 5) == 'fast'
+        assert time.time() - start < 0.5
+        release.set()
+        slow_call.join()
+        assert pool.stats()['pending'] == 0
+    finally:
+        for provider in providers:
+            provider.close()
+
+
+def test_cancel_request():
+    """取消调用之后等待中的线程立即被唤醒，占用的资源立即释放，之后到达的响应被丢弃"""
+    provider = FakeProvider(delay=0.3)
+    try:
+        pool = SelectorsConnectionPool()
+        handle = pool.submit(provider.host, build_request('echo', ['cancel']), 10)
+        errors = []
+
+        def wait():
+            try:
+                handle.result()
+            except DubboRequestCancelledException as e:
+                errors.append(e)
+
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        time.sleep(0.05)
+        start = time.time()
+        assert handle.cancel()
+        waiter.join()
+        assert time.time() - start < 0.1
+        assert len(errors) == 1 and handle.cancelled()
+        assert pool.occupancy(provider.host) == 0
+        assert pool.stats()['pending'] == 0
+
+        time.sleep(0.4)
+        assert pool.stats()['late'] == 1 and pool.stats()['cancelled'] == 1
+        assert not pool.results
+    finally:
+        provider.close()
+
+
+def test_cancel_completed_request():
+    """已经有结果的调用不能再被取消，其结果依然可以读取并且不会残留在连接池中"""
+    provider = FakeProvider()
+    try:
+        pool = SelectorsConnectionPool()
+        handle = pool.submit(provider.host, build_request('echo', ['done']), 5)
+        time.sleep(0.2)
+        assert not handle.cancel()
+        assert not pool.results
+        assert handle.result() == 'done'
+        assert pool.stats()['cancelled'] == 0
+    finally:
+        provider.close()
+
+
+def test_cancel_after_claimed_timeout(monkeypatch):
+    """读取线程没有及时处理超时、由等待的线程自己判定超时之后，cancel()和再次result()立即返回"""
+    provider = FakeProvider(delay=0.5)
+    try:
+        pool = SelectorsConnectionPool()
+        monkeypatch.setattr(pool, '_expire', lambda invoke_id, host, timeout: None)
+        handle = pool.submit(provider.host, build_request('echo', ['slow']), 0.1)
+        with pytest.raises(DubboRequestTimeoutException):
+            handle.result()
+        start = time.time()
+        assert not handle.cancel()
+        with pytest.raises(DubboRequestTimeoutException):
+            handle.result()
+        assert time.time() - start < 0.1
+        assert not handle.cancelled() and pool.stats()['cancelled'] == 0
+    finally:
+        provider.close()
+
+
+def test_lru_eviction():
+    """连接数超出上限时关闭最久未使用的连接"""
+    providers = [FakeProvider() for _ in range(3)]
+    try:
+        pool = SelectorsConnectionPool(max_connections=2)
+        for provider in providers[:2]:
+            assert pool.get(provider.host, build_request('echo', [1]), 5) == 1
+        time.sleep(0.01)
+        assert pool.get(providers[0].host, build_request('echo', [2]), 5) == 2
+        assert pool.get(providers[2].host, build_request('echo', [3]), 5) == 3
+        time.sleep(0.1)
+        assert sorted(pool._connection_pool) == sorted([providers[0].host, providers[2].host])
+        stats = pool.stats()
+        assert stats['evicted_lru'] == 1 and stats['connections'] == 2
+        # 被淘汰的host在下一次调用时重新建立连接
+        assert pool.get(providers[1].host, build_request('echo', [4]), 5) == 4
+    finally:
+        for provider in providers:
+            provider.close()
+
+
+def test_lru_eviction_after_busy():
+    """超出上限时所有连接都在使用中，调用结束之后立即关闭多余的连接，而不是等到空闲超时"""
+    providers = [FakeProvider(delay=0.2) for _ in range(3)]
+    try:
+        pool = SelectorsConnectionPool(max_connections=1)
+        handles = [pool.submit(provider.host, build_request('echo', [i]), 5) for i, provider in enumerate(providers)]
+        assert [handle.result() for handle in handles] == [0, 1, 2]
+        time.sleep(0.1)
+        stats = pool.stats()
+        assert stats['connections'] == 1 and stats['evicted_lru'] == 2
+    finally:
+        for provider in providers:
+            provider.close()
+
+
+def test_idle_connection_reaped():
+    """长时间未被使用的连接被关闭，心跳不会使连接保持存活"""
+    provider = FakeProvider()
+    try:
+        pool = SelectorsConnectionPool(idle_timeout=0.2)
+        assert pool.get(provider.host, build_request('echo', ['idle']), 5) == 'idle'
+        time.sleep(0.4)
+        assert not pool._connection_pool
+        assert pool.stats()['evicted_idle'] == 1
+        assert pool.get(provider.host, build_request('echo', ['again']), 5) == 'again'
+        assert provider.connections == 2
+    finally:
+        provider.close()
+
+
+def test_close_drains_pending():
+    """关闭连接池时等待在途的请求完成，之后不再接受新的请求，读取线程退出"""
+    provider = FakeProvider(delay=0.2)
+    try:
+        for pool in (SelectorsConnectionPool(), SelectConnectionPool(), ShardedConnectionPool(shards=2)):
+            results = []
+            caller = threading.Thread(target=lambda: results.append(
+                pool.get(provider.host, build_request('echo', ['drain']), 5)))
+            caller.start()
+            time.sleep(0.05)
+            pool.close(2)
+            caller.join()
+            assert results == ['drain']
+            with pytest.raises(DubboRejectedException):
+                pool.get(provider.host, build_request('echo', ['closed']), 5)
+            shards = pool._shards if isinstance(pool, ShardedConnectionPool) else [pool]
+            for shard in shards:
+                assert shard._reading_thread is None or not shard._reading_thread.is_alive()
+                assert not shard._connection_pool
+    finally:
+        provider.close()
+
+
+def test_close_fails_outstanding():
+    """超过等待期限之后仍未完成的请求以连接异常结束"""
+    provider = FakeProvider(delay=2)
+    try:
+        with SelectorsConnectionPool() as pool:
+            handle = pool.submit(provider.host, build_request('echo', ['slow']), 10)
+            start = time.time()
+            pool.close(0.1)
+            assert time.time() - start < 0.5
+            with pytest.raises(DubboConnectionException):
+                handle.result()
+            assert pool.stats()['pending'] == 0
+    finally:
+        provider.close()
+
+
+def test_lazy_start():
+    """导入模块不会创建连接池或者启动线程，连接池和读取线程在第一次调用时才创建"""
+    code = '''
+import threading
+import dubbo.client
+from dubbo.connection import connections
+assert threading.active_count() == 1, threading.enumerate()
+assert connections._connection_pool is None
+pool = connections.connection_pool
+assert pool is connections.get_connection_pool()
+assert threading.active_count() == 1, threading.enumerate()
+connections.close_connection_pool()
+assert connections._connection_pool is None
+'''
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.check_call([sys.executable, '-c', code], cwd=root)
+
+    provider = FakeProvider()
+    try:
+        with ShardedConnectionPool(shards=2) as pool:
+            assert all(shard._reading_thread is None for shard in pool._shards)
+            assert pool.get(provider.host, build_request('echo', [1]), 5) == 1
+            assert pool.shard(provider.host)._reading_thread.is_alive()
+            assert sum(shard._reading_thread is not None for shard in pool._shards) == 1
+    finally:
+        provider.close()
+
+
+def test_idle_connection_heartbeat(monkeypatch):
+    """连接空闲超时之后由读取线程发送心跳，收到心跳响应之后连接继续保留"""
+    monkeypatch.setattr(connections, 'TIMEOUT_IDLE', 0.2)
+    provider = FakeProvider()
+    try:
+        pool = SelectorsConnectionPool()
+        assert pool._select_timeout() is None
+        assert pool.get(provider.host, build_request('echo', ['idle']), 5) == 'idle'
+        time.sleep(0.5)
+        assert provider.heartbeats >= 1
+        assert len(pool._connection_pool[provider.host]) == 1
+    finally:
+        provider.close()
+
+
+if __name__ == '__main__':
+    test_selectors_pool_invoke()
+    test_select_pool_invoke()
+    test_parse_host()
+    test_ipv6_transport()
+    test_selectors_pool_many_hosts()
+    test_connections_grow_under_load()
+    test_large_response()
+    test_large_request()
+    test_large_string_request()
+    test_first_call_not_delayed()
+    test_parallel_connects()
+    test_connect_first()
+    test_connect_first_failover()
+    test_late_response_dropped()
+    test_inflight_limit()
+    test_disconnect_fails_pending()
+    test_socket_options()
+    test_socket_options_from_credentials()
+    test_sharded_pool()
+    test_cancel_request()
+    test_cancel_completed_request()
+    test_lru_eviction()
+    test_lru_eviction_after_busy()
+    test_idle_connection_reaped()
+    test_close_drains_pending()
+    test_close_fails_outstanding()
+    test_lazy_start()
+    print('连接池测试完成')
@@ -0,0 +1,89 @@
+"""
+通过插件的参数转换路径（DubboProtocolHandler._call_with_types）编码请求，检查服务端收到的参数
+"""
+import sys
+import os
+import socket
+import tempfile
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dubbo.client import DubboClient
+from dubbo.codec.decoder import Response
+from dubbo.codec.encoder import Request
+from tests.fake_provider import FakeProvider
+from utils.dubbo_utils import DubboProtocolHandler, dubbo_client_utils
+
+
+class EncodingClient(DubboClient):
+    """不发送请求，直接返回编码之后的请求"""
+
+    def call(self, method, args=(), param_types=None, timeout=None):
+        return bytes(Request(self._build_request_param(method, args, param_types)).encode())
+
+
+def encode_with_types(params, param_types):
+    client = EncodingClient('com.example.DemoService', host='127.0.0.1:20880')
+    return DubboProtocolHandler()._call_with_types(client, 'save', params, param_types)
+
+
+def decode_arguments(encoded, count):
+    body = Response(encoded[16:])
+    for _ in range(5):
+        body.read_next()
+    return [body.read_next() for _ in range(count)]
+
+
+def test_list_of_maps():
+    """List<Map>中键不同的map都按照map编码，不会共用同一个类定义"""
+    maps = [{'a': 1}, {'b': 2}]
+    for param_type in ('java.util.List<java.util.Map<String,Integer>>', 'java.util.List<Map<String,Integer>>',
+                       'java.util.List<java.lang.Object>', 'java.util.List'):
+        assert decode_arguments(encode_with_types(maps, [param_type]), 1) == [maps], param_type
+
+
+def test_nested_maps():
+    """对象字段中的字典以及Map参数按照map编码，键可以不是字符串"""
+    user = {'name': 'bob', 'tags': {'a': 1}, 'scores': [{'x': 1}, {'y': 2}]}
+    encoded = encode_with_types([user, {1: 'one', 2: 'two'}], ['com.example.User', 'Map<Integer,String>'])
+    decoded = decode_arguments(encoded, 2)
+    assert decoded[0]['tags'] == {'a': 1} and decoded[0]['scores'] == [{'x': 1}, {'y': 2}]
+    assert decoded[1] == {1: 'one', 2: 'two'}
+
+
+def test_list_declared_types():
+    """List参数以列表传给编码器，元素按照声明的泛型类型编码"""
+    encoded = encode_with_types([1, 2], ['java.util.List<java.lang.Long>'])
+    assert b'Ljava/util/List;\x7a\xe1\xe2H' in encoded
+    users = [{'name': 'bob'}, {'name': 'amy'}]
+    encoded = encode_with_types([users, [[{'name': 'tom'}]]],
+                                ['java.util.List<com.example.User>', 'java.util.List<java.util.List<com.example.User>>'])
+    assert encoded.count(b'C\x10com.example.User') == 1
+    assert decode_arguments(encoded, 2) == [users, [[{'name': 'tom'}]]]
+
+
+def test_invoke_service_transports():
+    """插件通过dubbo://以及dubbo+unix:///path.sock形式的URI调用服务"""
+    if not hasattr(socket, 'AF_UNIX'):
+        pytest.skip('Unix domain socket is not supported')
+    with tempfile.TemporaryDirectory() as directory:
+        providers = [FakeProvider(), FakeProvider(unix_path=os.path.join(directory, 'dubbo.sock'))]
+        try:
+            uris = ['dubbo://' + providers[0].host, 'dubbo+unix://' + providers[1].host[len('unix:'):]]
+            for uri in uris:
+                result = dubbo_client_utils.invoke_service(uri, 'com.example.DemoService', 'echo', 'hello',
+                                                           ['java.lang.String'], timeout=5000)
+                assert result == {'success': True, 'result': 'hello', 'message': 'Invocation successful'}, uri
+        finally:
+            for provider in providers:
+                provider.close()
+
+
+if __name__ == '__main__':
+    test_list_of_maps()
+    test_nested_maps()
+    test_list_declared_types()
+    test_invoke_service_transports()
+    print('参数转换测试完成')
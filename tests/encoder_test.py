@@ -0,0 +1,281 @@
+"""
+Hessian编码测试，期望的字节与改用bytearray写入之前的编码器的输出逐字节一致
+"""
+import sys
+import os
+from collections import OrderedDict
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dubbo.codec import encoder
+from dubbo.codec.decoder import Response
+from dubbo.codec.encoder import Request, Object
+from dubbo.common.exceptions import HessianTypeError
+
+VALUES = [
+    (0, '90'),
+    (-16, '80'),
+    (47, 'bf'),
+    (48, 'c830'),
+    (-2048, 'c000'),
+    (2047, 'cfff'),
+    (2048, 'd40800'),
+    (-0x40000, 'd00000'),
+    (0x3ffff, 'd7ffff'),
+    (0x40000, '4900040000'),
+    (2 ** 31 - 1, '497fffffff'),
+    (2 ** 31, '4c0000000080000000'),
+    (-2 ** 63, '4c8000000000000000'),
+    (0.0, '5b'),
+    (1.0, '5c'),
+    (-128.0, '5d80'),
+    (32767.0, '5e7fff'),
+    (1.5, '5f000005dc'),
+    (0.001, '5f00000001'),
+    (3.14159, '44400921f9f01b866e'),
+    (True, '54'),
+    (False, '46'),
+    (None, '4e'),
+    ('', '00'),
+    ('hello', '0568656c6c6f'),
+    (u'é中', '02c3a9e4b8ad'),
+    ('a' * 32, '3020' + '61' * 32),
+    ('b' * 1024, '530400' + '62' * 1024),
+    ([1, 2, 3], '73045b696e74919293'),
+    (['a'] * 7, '56075b737472696e6797' + '0161' * 7),
+    ([], '4e'),
+    (b'', '20'),
+    (b'\x01\x02', '220102'),
+    (b'x' * 16, '3410' + '78' * 16),
+    (b'x' * 1024, '420400' + '78' * 1024),
+    ({}, '485a'),
+    ({'a': 1, 2: None}, '4801619192' + '4e5a'),
+]
+
+
+def encode_value(value):
+    return bytes(Request({})._encode_single_value(value)).hex()
+
+
+def test_encode_values():
+    """各种类型的单个值按照hessian协议编码"""
+    for value, expected in VALUES:
+        assert encode_value(value) == expected, value
+
+
+def test_encode_request():
+    """完整的请求包括请求头、参数类型、重复使用的类定义以及attachments"""
+    request = Request({
+        'dubbo_version': '2.4.10',
+        'version': '',
+        'path': 'com.example.DemoService',
+        'method': 'save',
+        'arguments': [Object('com.example.User', {'name': 'bob', 'age': 18}),
+                      Object('com.example.User', {'name': 'amy', 'age': 20})],
+        'context': None
+    })
+    request.invoke_id = 42
+    assert bytes(request.encode()).hex() == (
+        'dabbc200000000000000002a000000bd06322e342e313017636f6d2e6578616d706c652e44656d6f5365727669636500047361'
+        '766530244c636f6d2f6578616d706c652f557365723b4c636f6d2f6578616d706c652f557365723b4310636f6d2e6578616d70'
+        '6c652e5573657292046e616d65036167656003626f62a26003616d79a448047061746817636f6d2e6578616d706c652e44656d'
+        '6f5365727669636509696e7465726661636517636f6d2e6578616d706c652e44656d6f536572766963650776657273696f6e00'
+        '5a')
+
+
+def test_encode_many_classes():
+    """超过16个类定义之后使用'O'加类编号引用"""
+    request = Request({})
+    for i in range(17):
+        request._encode_single_value(Object('com.example.C{}'.format(i)))
+    assert bytes(request._encode_single_value(Object('com.example.C16'))).hex() == '4fa0'
+    assert bytes(request._encode_single_value(Object('com.example.C3'))).hex() == '63'
+
+
+def test_encode_supplementary_characters():
+    """基本多文种平面之外的字符按照UTF-16代理对编码，长度为代码单元的个数，与Java保持一致"""
+    assert encode_value(u'\U0001f600') == '02eda0bdedb880'
+    assert encode_value(u'a\U0001f600b') == '0461eda0bdedb88062'
+    # 单独出现的代理项同样编码为3个字节
+    assert encode_value(u'\ud800') == '01eda080'
+    text = u'中' * 0x3ff + u'\U00020000'
+    assert encode_value(text)[:6] == '530401'
+
+
+def test_decode_supplementary_characters():
+    """解码时把代理对合并为一个字符"""
+    for value in (u'\U0001f600', u'emoji \U0001f600 and \U00020000 中文', u'lone \udc00',
+                  u'x' * 100 + u'\U0001f600'):
+        assert Response(bytes(Request({})._encode_single_value(value))).read_next() == value
+
+
+def test_encode_chunked_string():
+    """超过0x8000个代码单元的字符串拆分为'R'块，块不会在代理对的中间断开"""
+    assert encode_value('a' * 0x8000)[:6] == '538000'
+    encoded = encode_value('a' * 0x8001)
+    assert encoded[:6] == '528000' and encoded[6 + 0x8000 * 2:] == '0161'
+    encoded = encode_value(u'a' * 0x7fff + u'\U0001f600')
+    assert encoded[:6] == '527fff' and encoded[6 + 0x7fff * 2:] == '02eda0bdedb880'
+    for value in ('a' * 70000, u'中' * 0x10001, u'x\U0001f600' * 50000):
+        assert Response(bytes(Request({})._encode_single_value(value))).read_next() == value
+
+
+def test_encode_chunked_bytes():
+    """二进制数据超过0x8000字节时拆分为'A'块，参数类型为byte[]"""
+    data = bytes(range(256)) * 300
+    encoded = encode_value(data)
+    assert encoded[:6] == '418000' and encoded[6 + 0x8000 * 2:][:6] == '418000'
+    for value in (data, bytearray(data), memoryview(data), b'x' * 0x8000, b''):
+        assert Response(bytes(Request({})._encode_single_value(value))).read_next() == bytes(value)
+    assert Request({})._get_parameter_types([b'x', 'a']) == '[BLjava/lang/String;'
+
+
+def test_encode_invalid_values():
+    """不支持的类型以及元素类型不一致的列表抛出HessianTypeError"""
+    for value in ([None], [1, 'a'], [True, 1], {'a': set()}):
+        with pytest.raises(HessianTypeError):
+            Request({})._encode_single_value(value)
+
+
+def build(method='save', arguments=None, context=None, **kwargs):
+    body = {
+        'dubbo_version': '2.4.10',
+        'version': '1.0',
+        'path': 'com.example.DemoService',
+        'method': method,
+        'arguments': arguments or [],
+        'context': context
+    }
+    body.update(kwargs)
+    request = Request(body)
+    request.invoke_id = 7
+    return bytes(request.encode())
+
+
+def test_request_template_cache():
+    """命中缓存的请求与首次编码的结果一致，不同的方法签名使用不同的模板"""
+    encoder._templates.clear()
+    first = build(arguments=['a', 1])
+    assert len(encoder._templates) == 1
+    assert build(arguments=['a', 1]) == first
+    assert build(arguments=['b', 2]) != first
+    assert len(encoder._templates) == 1
+    build(arguments=[1, 'a'])
+    # 显式提供的参数类型以类型本身作为key，编码结果与推断的类型相同
+    assert build(arguments=['a', 1], parameter_types=['java.lang.String', 'int']) == first
+    build(method='update', arguments=['a', 1])
+    assert len(encoder._templates) == 4
+
+
+def test_request_template_context():
+    """带有context的请求仍然按照调用方的attachments编码，并且不影响缓存的默认attachments"""
+    encoder._templates.clear()
+    plain = build(arguments=['a'])
+    with_context = build(arguments=['a'], context={'version': '2.0', 'token': 'abc'})
+    assert with_context != plain
+    attachments = Response(with_context[16:])
+    for _ in range(6):
+        attachments.read_next()
+    assert attachments.read_next() == {'path': 'com.example.DemoService', 'interface': 'com.example.DemoService',
+                                       'version': '2.0', 'token': 'abc'}
+    assert build(arguments=['a']) == plain
+
+
+def test_request_template_cache_bounded(monkeypatch):
+    """缓存的模板数量不超过REQUEST_TEMPLATE_CACHE_SIZE"""
+    monkeypatch.setattr(encoder, 'REQUEST_TEMPLATE_CACHE_SIZE', 3)
+    encoder._templates.clear()
+    for i in range(10):
+        build(method='m{}'.format(i))
+    assert len(encoder._templates) == 3
+    assert build(method='m0') == build(method='m0')
+
+
+def test_encode_dict():
+    """字典编码为'H'开头的map，键可以是任意支持的类型，嵌套的字典同样编码为map"""
+    value = {'name': 'bob', 1: [1.5], 'nested': {'tags': ['a'], 'empty': {}}, 'data': b'\x00'}
+    assert Response(bytes(Request({})._encode_single_value(value))).read_next() == value
+    assert encode_value(OrderedDict([('a', 1)])) == encode_value({'a': 1})
+    assert Response(bytes(Request({})._encode_single_value([{'a': 1}, {'b': 2}]))).read_next() == [{'a': 1}, {'b': 2}]
+    assert Request({})._get_parameter_types([{}, 'a']) == 'Ljava/util/Map;Ljava/lang/String;'
+
+
+def decode_arguments(encoded, count):
+    body = Response(encoded[16:])
+    for _ in range(5):
+        body.read_next()
+    return [body.read_next() for _ in range(count)]
+
+
+def test_encode_declared_types():
+    """按照声明的参数类型编码，long类型即使在int范围内也编码为hessian的long"""
+    encoded = build(arguments=[5, 5], parameter_types=['long', 'java.lang.Integer'])
+    assert b'JLjava/lang/Integer;\xe5\x95H' in encoded
+    encoded = build(arguments=[2 ** 40, 3, 'x'], parameter_types=['java.lang.Long', 'double', 'char'])
+    assert decode_arguments(encoded, 3) == [2 ** 40, 3.0, 'x']
+    # 类型与声明不符的值以及None按照实际类型写入
+    encoded = build(arguments=['5', None], parameter_types=['long', 'long'])
+    assert decode_arguments(encoded, 2) == ['5', None]
+
+
+def test_encode_declared_collections():
+    """集合类型的元素、键和值同样按照泛型参数声明的类型编码"""
+    user = Object('com.example.User', {'name': 'bob'})
+    types = ['java.util.List<com.example.User>', 'java.util.Map<String,java.lang.Long>', 'int[]',
+             'List<List<Long>>', '[Ljava.lang.String;', 'java.util.Set']
+    arguments = [[user, None], {'a': 1, 'b': None}, list(range(10)), [[1], []], ('x', 'y'), []]
+    encoded = build(arguments=arguments, parameter_types=types)
+    decoded = decode_arguments(encoded, len(arguments))
+    assert decoded[0][0]['name'] == 'bob' and decoded[0][1] is None
+    assert decoded[1:] == [{'a': 1, 'b': None}, list(range(10)), [[1], []], ['x', 'y'], []]
+    # java.util.List使用无类型列表，数组使用带有类型的列表
+    assert b'[int' in encoded and b'[string' in encoded and b'[object' not in encoded
+    assert b'H\x01a\xe1\x01b' in encoded
+    assert b'Ljava/util/List;Ljava/util/Map;[I' in encoded
+
+
+def test_encode_declared_classes():
+    """声明为类的字典按照此类的对象编码，同一个类的字段不同时使用不同的类定义"""
+    users = [{'name': 'bob', 'age': 18}, {'name': 'amy'}, {'name': 'tom', 'age': 20}]
+    types = ['java.util.List<com.x.User>', 'com.x.User', 'com.x.User[]']
+    arguments = [users, {'name': 'top'}, [None, {'name': 'arr'}]]
+    encoded = build(arguments=arguments, parameter_types=types)
+    assert decode_arguments(encoded, 3) == arguments
+    assert b'{C\x0acom.x.User\x92\x04name\x03age`\x03bob\xa2C\x0acom.x.User\x91\x04name' in encoded
+    assert encoded.count(b'C\x0acom.x.User') == 2
+    assert b'H\x04name' not in encoded
+    assert b'`\x03tom\xa4a\x03topr\x0b[com.x.UserNa\x03arr' in encoded
+
+
+def test_encode_declared_maps():
+    """HashMap以外的映射类型编码为'M'加上类型，重复出现的类型只写入编号"""
+    types = ['java.util.TreeMap<String,Long>', 'java.util.LinkedHashMap', 'java.util.SortedMap<Integer,String>',
+             'java.util.HashMap<String,String>']
+    arguments = [{'a': 1}, OrderedDict([('b', 2)]), {3: 'c'}, {'d': 'e'}]
+    encoded = build(arguments=arguments, parameter_types=types)
+    assert decode_arguments(encoded, len(arguments)) == arguments
+    assert b'M\x11java.util.TreeMap\x01a\xe1Z' in encoded
+    assert b'M\x17java.util.LinkedHashMap\x01b\x92Z' in encoded
+    assert b'M\x90\x93\x01cZ' in encoded
+    assert b'H\x01d\x01eZ' in encoded
+
+
+if __name__ == '__main__':
+    test_encode_values()
+    test_encode_request()
+    test_encode_many_classes()
+    test_encode_supplementary_characters()
+    test_decode_supplementary_characters()
+    test_encode_chunked_string()
+    test_encode_chunked_bytes()
+    test_encode_invalid_values()
+    test_request_template_cache()
+    test_request_template_context()
+    test_encode_declared_types()
+    test_encode_declared_collections()
+    test_encode_declared_classes()
+    test_encode_dict()
+    test_encode_declared_maps()
+    print('编码测试完成')
@@ -0,0 +1,141 @@
+"""
+本地的Dubbo服务端模拟，用于在没有真实Java服务的情况下测试连接池
+
+收到请求后解析出方法名和参数，交给handler计算结果后按照dubbo协议返回
+"""
+import socket
+import struct
+import sys
+import os
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dubbo.codec.decoder import Response
+from dubbo.codec.encoder import Request
+
+
+def echo_handler(method, args):
+    """默认的handler，返回第一个参数，没有参数时返回方法名"""
+    return args[0] if args else method
+
+
+def encode_value(value):
+    """按照hessian协议对返回值进行编码"""
+    return bytes(Request({})._encode_single_value(value))
+
+
+class FakeProvider(object):
+    """
+    模拟的dubbo服务提供者，每个连接使用一个线程处理
+    """
+
+    def __init__(self, handler=echo_handler, delay=0, host='127.0.0.1', unix_path=None):
+        """
+        :param host: 监听的ip，可以是IPv6地址
+        :param unix_path: 不为None时改为监听此路径上的Unix domain socket
+        """
+        self.handler = handler
+        self.delay = delay
+        self.requests = 0
+        self.heartbeats = 0
+        self.connections = 0
+        if unix_path is not None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.bind(unix_path)
+            self.port = None
+            self.host = 'unix:' + unix_path
+        else:
+            family = socket.AF_INET6 if ':' in host else socket.AF_INET
+            self._sock = socket.socket(family, socket.SOCK_STREAM)
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._sock.bind((host, 0))
+            self.port = self._sock.getsockname()[1]
+            self.host = ('[{}]:{}' if family == socket.AF_INET6 else '{}:{}').format(host, self.port)
+        self._sock.listen(128)
+        self._clients = []
+        self._running = True
+        thread = threading.Thread(target=self._accept)
+        thread.daemon = True
+        thread.start()
+
+    def _accept(self):
+        while self._running:
+            try:
+                client, _ = self._sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            self._clients.append(client)
+            thread = threading.Thread(target=self._serve, args=(client,))
+            thread.daemon = True
+            thread.start()
+
+    @staticmethod
+    def _recv_exactly(client, length):
+        data = b''
+        while len(data) < length:
+            chunk = client.recv(length - len(data))
+            if not chunk:
+                raise EOFError()
+            data += chunk
+        return data
+
+    def _serve(self, client):
+        lock = threading.Lock()
+        try:
+            while self._running:
+                head = self._recv_exactly(client, 16)
+                invoke_id = head[4:12]
+                body = self._recv_exactly(client, struct.unpack('!i', head[12:])[0])
+                # 心跳请求
+                if head[2] & 0x20:
+                    self.heartbeats += 1
+                    with lock:
+                        client.sendall(b'\xda\xbb\x22\x14' + invoke_id + b'\x00\x00\x00\x01N')
+                    continue
+                self.requests += 1
+                thread = threading.Thread(target=self._reply, args=(client, lock, invoke_id, body))
+                thread.daemon = True
+                thread.start()
+        except (EOFError, OSError):
+            pass
+
+    def _reply(self, client, lock, invoke_id, body):
+        res = Response(body)
+        res.read_next()  # dubbo version
+        res.read_next()  # path
+        res.read_next()  # version
+        method = res.read_next()
+        signature = res.read_next()
+        args = []
+        while res.length() > 0 and res.get_byte() != ord('H'):
+            args.append(res.read_next())
+        if self.delay:
+            time.sleep(self.delay)
+        try:
+            payload = b'\x91' + encode_value(self.handler(method, args))
+        except Exception:
+            payload = b'\x92'  # 返回NULL
+        head = b'\xda\xbb\x02\x14' + invoke_id + struct.pack('!i', len(payload))
+        with lock:
+            try:
+                client.sendall(head + payload)
+            except OSError:
+                pass
+
+    def drop_connections(self):
+        """主动断开所有客户端连接"""
+        for client in self._clients:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+                client.close()
+            except OSError:
+                pass
+        self._clients = []
+
+    def close(self):
+        self._running = False
+        self.drop_connections()
+        self._sock.close()
@@ -0,0 +1,51 @@
+"""
+哈希时间轮测试
+"""
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dubbo.common.timer import HashedWheelTimer
+
+
+def wait_until_empty(timer, limit=2):
+    start = time.time()
+    while timer and time.time() - start < limit:
+        time.sleep(timer.next_timeout())
+        timer.advance()
+
+
+def test_timeouts_expire_in_order():
+    """定时任务在到期之后按照到期时间依次执行，且不会提前执行"""
+    timer = HashedWheelTimer(tick_duration=0.01, ticks_per_wheel=8)
+    fired = []
+    start = time.time()
+    for delay in (0.15, 0.05, 0.1):
+        timer.add(delay, lambda delay=delay: fired.append((delay, time.time() - start)))
+    assert len(timer) == 3
+    wait_until_empty(timer)
+    assert [delay for delay, _ in fired] == [0.05, 0.1, 0.15]
+    for delay, elapsed in fired:
+        assert elapsed >= delay
+
+
+def test_cancelled_timeout_never_fires():
+    """取消的定时任务不会执行"""
+    timer = HashedWheelTimer(tick_duration=0.01, ticks_per_wheel=8)
+    fired = []
+    timeout = timer.add(0.02, lambda: fired.append(1))
+    timer.add(0.03, lambda: fired.append(2))
+    timeout.cancel()
+    timeout.cancel()
+    assert len(timer) == 1
+    wait_until_empty(timer)
+    assert fired == [2]
+    assert timer.next_timeout() is None
+
+
+if __name__ == '__main__':
+    test_timeouts_expire_in_order()
+    test_cancelled_timeout_never_fires()
+    print('时间轮测试完成')
@@ -7,6 +7,7 @@ from typing import Any, List, Dict, Optional, Union
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 
+from dubbo.connection.socket_options import SocketOptions
 from utils.dubbo_utils import dubbo_client_utils
 
 
@@ -22,10 +23,14 @@ class DubboInvokeTool(Tool):
             credentials = self.runtime.credentials
             dubbo_version = credentials.get("dubbo_version", "2.4.10")
             timeout = int(credentials.get("timeout", "60000"))
+            connect_stagger = int(credentials.get("connect_stagger") or 0)
+            # Socket options apply to connections created after this point
+            dubbo_client_utils.configure_connections(SocketOptions.from_credentials(credentials))
         else:
             # 测试环境或runtime不可用时使用默认值
             dubbo_version = "2.4.10"
             timeout = 60000
+            connect_stagger = 0
         
         # Get parameters
         registry_address = tool_parameters.get("registry_address", "")
@@ -70,7 +75,8 @@ class DubboInvokeTool(Tool):
             else:
                 logging.info(f"Start invoking service through registry: {registry_address}, {interface}.{method}, params: {param_objects}, types: {param_types}, dubbo_version: {dubbo_version}, timeout: {timeout}ms")
                 result = dubbo_client_utils.invoke_with_registry(
-                    registry_address, interface, method, param_objects, param_types, dubbo_version, timeout
+                    registry_address, interface, method, param_objects, param_types, dubbo_version, timeout,
+                    connect_stagger
                 )
                 
             # Calculate elapsed time
@@ -20,6 +20,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from dubbo.client import DubboClient
 from dubbo.codec.encoder import Object
+from dubbo.common.util import UNIX_HOST_PREFIX, parse_host
+from dubbo.connection.connections import get_connection_pool
 
 from utils.registry_strategy import RegistryFactory
 
@@ -78,7 +80,7 @@ class DubboProtocolHandler(ProtocolHandler):
     # 类常量：Map类型集合
     MAP_TYPES = frozenset({
         'java.util.Map', 'java.util.HashMap', 'java.util.LinkedHashMap',
-        'java.util.TreeMap', 'java.util.ConcurrentHashMap'
+        'java.util.TreeMap', 'java.util.ConcurrentHashMap', 'java.util.concurrent.ConcurrentHashMap'
     })
     
     # 类常量：List类型集合
@@ -89,6 +91,26 @@ class DubboProtocolHandler(ProtocolHandler):
     
     # 编译一次的正则表达式
     URI_PATTERN = re.compile(r'^(?:dubbo:\/\/)?([^\/]+)(?:\/.*)?$')
+    # 通过Unix domain socket连接的URI前缀，之后的部分是socket文件的绝对路径
+    UNIX_URI_PREFIX = 'dubbo+unix://'
+    
+    @classmethod
+    def uri_to_host(cls, service_uri: str) -> Optional[str]:
+        """
+        Extract the connection pool host from a service URI
+        
+        Parameters:
+            service_uri: dubbo://host:port, dubbo://[ipv6]:port, dubbo+unix:///path.sock or host:port
+            
+        Returns:
+            host:port, [ipv6]:port or unix:/path.sock, None if the URI cannot be parsed
+        """
+        if service_uri.startswith(cls.UNIX_URI_PREFIX):
+            path = service_uri[len(cls.UNIX_URI_PREFIX):].split('?', 1)[0]
+            return UNIX_HOST_PREFIX + path if path else None
+        match = cls.URI_PATTERN.match(service_uri)
+        return match.group(1) if match else None
+    
     
     def invoke(
         self, 
@@ -117,29 +139,22 @@ class DubboProtocolHandler(ProtocolHandler):
         """
         try:
             # Parse URI, extract host:port
-            match = self.URI_PATTERN.match(service_uri)
-            if not match:
+            host_port = self.uri_to_host(service_uri)
+            if not host_port:
                 return {
                     "success": False, 
                     "result": None, 
-                    "message": f"Service URI format error: {service_uri}, should be dubbo://host:port or host:port"
+                    "message": f"Service URI format error: {service_uri}, should be dubbo://host:port, dubbo://[ipv6]:port, dubbo+unix:///path.sock or host:port"
                 }
             
-            host_port = match.group(1)
-            
             # Validate host:port format
             try:
-                if ':' not in host_port:
-                    raise ValueError("Missing port separator")
-                host, port_str = host_port.rsplit(":", 1)  # Use rsplit to handle IPv6
-                port = int(port_str)
-                if not (1 <= port <= 65535):
-                    raise ValueError("Port out of valid range")
+                parse_host(host_port)
             except ValueError as ve:
                 return {
                     "success": False, 
                     "result": None, 
-                    "message": f"Service address format error: {host_port}, should be host:port format. Details: {ve}"
+                    "message": f"Service address format error: {host_port}, should be host:port, [ipv6]:port or unix:/path.sock format. Details: {ve}"
                 }
             
             # Create DubboClient and invoke service with configured version
@@ -171,13 +186,24 @@ class DubboProtocolHandler(ProtocolHandler):
         """
         Extract clean type name without generic information
         
+        Well-known java.lang and java.util types written without package, such as
+        "Map<String,Integer>", are returned with their package.
+        
         Args:
             param_type: Parameter type string
             
         Returns:
             Clean type name
         """
-        return param_type.split('<')[0].strip()
+        clean_type = param_type.split('<')[0].strip()
+        if '.' not in clean_type:
+            if 'java.lang.' + clean_type in self.BASIC_TYPES or clean_type == 'Object':
+                return 'java.lang.' + clean_type
+            java_util_type = 'java.util.' + clean_type
+            if java_util_type in self.COLLECTION_TYPES or java_util_type in self.MAP_TYPES \
+                    or java_util_type in self.LIST_TYPES:
+                return java_util_type
+        return clean_type
     
     def _is_object_type(self, param_type: str) -> bool:
         """
@@ -193,21 +219,10 @@ class DubboProtocolHandler(ProtocolHandler):
         
         return (clean_type not in self.BASIC_TYPES and 
                 clean_type not in self.COLLECTION_TYPES and
+                clean_type not in self.MAP_TYPES and
+                clean_type != 'java.lang.Object' and  # Dictionaries are sent as maps
                 not clean_type.startswith('['))  # Array types
     
-    def _is_map_type(self, param_type: str) -> bool:
-        """
-        Determine if parameter type is Map type
-        
-        Args:
-            param_type: Parameter type string
-            
-        Returns:
-            Whether it is Map type
-        """
-        clean_type = self._extract_clean_type(param_type)
-        return clean_type in self.MAP_TYPES
-    
     def _is_list_type(self, param_type: str) -> bool:
         """
         Determine if parameter type is List type
@@ -223,7 +238,10 @@ class DubboProtocolHandler(ProtocolHandler):
     
     def _convert_dict_to_object(self, value: dict, param_type: str) -> Object:
         """
-        Convert Python dictionary to dubbo Object, recursively handle nested dictionaries and lists
+        Convert Python dictionary to dubbo Object
+        
+        Nested dictionaries are kept as they are and encoded as Hessian maps,
+        which Java deserializes into the declared field type.
         
         Args:
             value: Python dictionary
@@ -238,105 +256,46 @@ class DubboProtocolHandler(ProtocolHandler):
         # Create Object instance
         obj = Object(clean_type)
         
-        # Recursively handle all key-value pairs in dictionary
         for key, val in value.items():
-            converted_val = self._convert_nested_value(val)
-            obj[key] = converted_val
+            obj[key] = val
         
         self.logger.debug(f"Convert dictionary to Object: {clean_type} -> {obj}")
         return obj
     
-    def _convert_nested_value(self, value):
+    def _extract_element_type(self, param_type: str) -> Optional[str]:
         """
-        Recursively convert nested values, convert Python dictionaries to Object, keep other types unchanged
+        Extract the generic element type of a List type
         
         Args:
-            value: Value to convert
+            param_type: Java List type name, e.g., "java.util.List<com.example.User>"
             
         Returns:
-            Converted value
-        """
-        if isinstance(value, dict):
-            # For nested dictionaries, convert to generic Object type
-            return self._convert_dict_to_object(value, "java.lang.Object")
-        elif isinstance(value, list):
-            # For lists, recursively process each element
-            return [self._convert_nested_value(item) for item in value]
-        else:
-            # Other types (basic types) remain unchanged
-            return value
-    
-    def _convert_list_to_arraylist(self, value: list, param_type: str) -> list:
+            Element type, None if the type has no generic information
         """
-        Keep Python list unchanged, return directly (deprecated method, kept for compatibility)
-        
-        Args:
-            value: Python list
-            param_type: Java type name, e.g., "java.util.List<java.lang.String>"
-            
-        Returns:
-            Original Python list
-            
-        Note:
-            This method is deprecated and may be removed in future versions.
-            Use _convert_list_to_java_collection instead.
-        """
-        # Ensure list elements are of correct type
-        if 'java.lang.String' in param_type:
-            # Ensure all elements are string type
-            converted_list = [str(item) for item in value]
-        else:
-            converted_list = value
-        
-        self.logger.debug(f"List parameter kept as is: {param_type} -> contains {len(converted_list)} elements: {converted_list}")
-        return converted_list
+        if '<' in param_type and '>' in param_type:
+            start = param_type.find('<') + 1
+            end = param_type.rfind('>')
+            return param_type[start:end].strip()
+        return None
     
-    def _convert_list_to_java_collection(self, value: list, param_type: str) -> Object:
+    def _convert_list_elements(self, value: list, param_type: str) -> list:
         """
-        Convert Python list to Java Collection object, correctly handle complex element types
+        Convert list elements according to the generic element type
+        
+        Dictionaries become Objects only when the element type is a class,
+        Map elements and untyped elements are kept and encoded as Hessian maps.
         
         Args:
             value: Python list
-            param_type: Java List type name (e.g., java.util.List, java.util.ArrayList, etc.)
+            param_type: Java List type name, e.g., "java.util.List<com.example.User>"
             
         Returns:
-            Object instance representing Java Collection object
+            Python list with converted elements
         """
-        # Clean generic information, get pure class name
-        clean_type = self._extract_clean_type(param_type)
-        
-        # For List interface, use ArrayList as implementation class
-        if clean_type == "java.util.List":
-            clean_type = "java.util.ArrayList"
-        
-        # Extract generic type information
-        element_type = None
-        if '<' in param_type and '>' in param_type:
-            start = param_type.find('<') + 1
-            end = param_type.rfind('>')
-            element_type = param_type[start:end].strip()
-        
-        # Convert elements in list
-        converted_elements = []
-        for item in value:
-            if isinstance(item, dict) and element_type:
-                # If it's a dictionary and has explicit element type, convert to Object
-                converted_item = self._convert_dict_to_object(item, element_type)
-                converted_elements.append(converted_item)
-            else:
-                # Other types remain unchanged
-                converted_elements.append(item)
-        
-        # Create a standard Java ArrayList object
-        collection_obj = Object(clean_type)
-        
-        # Use standard ArrayList field structure
-        # elementData is the field name for ArrayList's internal storage array
-        collection_obj['elementData'] = converted_elements
-        collection_obj['size'] = len(converted_elements)
-        
-        self.logger.debug(f"Convert Python list to Java Collection: {param_type} -> {clean_type} object ({len(converted_elements)} elements, element type: {element_type})")
-        return collection_obj
+        element_type = self._extract_element_type(param_type)
+        if not element_type:
+            return list(value)
+        return [self._convert_single_param(item, element_type) for item in value]
     
     def _convert_single_param(self, param: Any, param_type: str, index: Optional[int] = None) -> Any:
         """
@@ -351,19 +310,18 @@ class DubboProtocolHandler(ProtocolHandler):
             Converted parameter
         """
         if isinstance(param, dict):
-            if self._is_object_type(param_type) or self._is_map_type(param_type):
-                # Object type or Map type: convert to Object
+            if self._is_object_type(param_type):
+                # Object type: convert to Object, Map type is encoded directly as a Hessian map
                 converted_param = self._convert_dict_to_object(param, param_type)
                 log_prefix = f"Parameter[{index}]" if index is not None else "Single parameter"
-                type_desc = "Map" if self._is_map_type(param_type) else "object"
-                self.logger.debug(f"{log_prefix} {type_desc} conversion: {param_type} -> {type(converted_param)}")
+                self.logger.debug(f"{log_prefix} object conversion: {param_type} -> {type(converted_param)}")
                 return converted_param
         elif isinstance(param, list):
             if self._is_list_type(param_type):
-                # List type: convert to Java Collection object
-                converted_param = self._convert_list_to_java_collection(param, param_type)
+                # List type: keep a Python list so the encoder writes it with the declared element types
+                converted_param = self._convert_list_elements(param, param_type)
                 log_prefix = f"Parameter[{index}]" if index is not None else "Single parameter"
-                self.logger.debug(f"{log_prefix} List type: {param_type} -> converted to Java Collection object")
+                self.logger.debug(f"{log_prefix} List type: {param_type} -> {len(converted_param)} elements")
                 return converted_param
         
         # Other types remain unchanged
@@ -404,7 +362,8 @@ class DubboProtocolHandler(ProtocolHandler):
         elif len(param_types) == 1:
             # Single parameter invocation
             converted_params = self._convert_single_param(params, param_types[0])
-            return client.call(method, converted_params, param_types, timeout=timeout)
+            # Always wrap the single parameter, otherwise a list parameter is taken as the argument list
+            return client.call(method, [converted_params], param_types, timeout=timeout)
         else:
             # Multi-parameter invocation - params must be list
             if not isinstance(params, (list, tuple)):
@@ -425,6 +384,27 @@ class DubboProtocolHandler(ProtocolHandler):
 class ProtocolFactory:
     """Protocol factory, creates corresponding protocol handler based on URI"""
     
+    # 同一个协议在不同传输方式下的URI前缀，使用同一个protocol handler
+    PROTOCOL_ALIASES = {
+        'dubbo+unix': 'dubbo',
+    }
+    
+    @classmethod
+    def get_protocol(cls, service_uri: str) -> str:
+        """
+        Get the protocol name of a service URI
+        
+        Parameters:
+            service_uri: Service URI, e.g., dubbo://host:port or dubbo+unix:///path.sock
+            
+        Returns:
+            Protocol name, dubbo if the URI has no protocol prefix
+        """
+        if "://" not in service_uri:
+            return "dubbo"
+        protocol = service_uri.split("://")[0].lower()
+        return cls.PROTOCOL_ALIASES.get(protocol, protocol)
+    
     @staticmethod
     def create_protocol_handler(service_uri: str) -> ProtocolHandler:
         """
@@ -441,10 +421,7 @@ class ProtocolFactory:
             raise ValueError("Service URI cannot be empty")
         
         # If no protocol is specified, use dubbo by default
-        if "://" not in service_uri:
-            service_uri = f"dubbo://{service_uri}"
-        
-        protocol = service_uri.split("://")[0].lower()
+        protocol = ProtocolFactory.get_protocol(service_uri)
         
         if protocol == "dubbo":
             return DubboProtocolHandler()
@@ -465,6 +442,15 @@ class DubboClientUtils:
         # 缓存已创建的protocol handler以避免重复创建
         self._protocol_handler_cache = {}
 
+    def configure_connections(self, socket_options) -> None:
+        """
+        Set socket options for connections created from now on
+
+        Args:
+            socket_options: dubbo.connection.socket_options.SocketOptions
+        """
+        get_connection_pool().configure(socket_options)
+
     def invoke_with_registry(
         self, 
         registry_address: str, 
@@ -473,7 +459,8 @@ class DubboClientUtils:
         params: Optional[Any] = None,
         param_types: Optional[List[str]] = None,
         dubbo_version: str = "2.4.10",
-        timeout: int = 60000
+        timeout: int = 60000,
+        connect_stagger: int = 0
     ) -> Dict[str, Any]:
         """
         Invoke Dubbo service through registry
@@ -486,6 +473,8 @@ class DubboClientUtils:
             param_types: parameter types (optional)
             dubbo_version: Dubbo version (optional)
             timeout: Timeout in milliseconds (optional)
+            connect_stagger: when positive, race a connect to a second provider after this many
+                milliseconds and use whichever connects first (optional)
             
         Returns:
             call result
@@ -500,7 +489,11 @@ class DubboClientUtils:
             registry_strategy = RegistryFactory.create_registry(registry_type)
             
             # Get provider address from registry
-            provider_uri = registry_strategy.get_provider(address, interface)
+            if connect_stagger > 0:
+                provider_uri = self._connect_first(registry_strategy.get_candidates(address, interface),
+                                                   connect_stagger)
+            else:
+                provider_uri = registry_strategy.get_provider(address, interface)
                 
             self.logger.debug(f"Get provider from registry: {provider_uri}")
             
@@ -510,6 +503,33 @@ class DubboClientUtils:
             self.logger.error(f"Failed to get provider from registry: {str(e)}", exc_info=True)
             return {"success": False, "result": None, "message": f"Failed to get service provider from registry: {str(e)}"}
 
+    def _connect_first(self, provider_uris: List[str], connect_stagger: int) -> str:
+        """
+        Race connects to the candidate providers and return the one connected first
+        
+        Args:
+            provider_uris: candidate provider URIs, the first one is preferred
+            connect_stagger: milliseconds to wait before starting the next candidate
+            
+        Returns:
+            provider URI; the preferred one if no candidate could connect, so that
+            the error is reported by the invocation itself
+        """
+        hosts = {}
+        for uri in provider_uris:
+            host = DubboProtocolHandler.uri_to_host(uri)
+            if host:
+                hosts.setdefault(host, uri)
+        if len(hosts) < 2:
+            return provider_uris[0]
+        try:
+            host = get_connection_pool().connect_first(list(hosts), connect_stagger / 1000.0)
+        except Exception as e:
+            self.logger.debug(f"No candidate provider connected: {str(e)}")
+            return provider_uris[0]
+        self.logger.debug(f"Provider connected first: {hosts[host]}")
+        return hosts[host]
+
     def invoke_service(
         self, 
         service_uri: str, 
@@ -539,10 +559,7 @@ class DubboClientUtils:
         
         try:
             # Get protocol type for caching
-            if "://" not in service_uri:
-                protocol = "dubbo"
-            else:
-                protocol = service_uri.split("://")[0].lower()
+            protocol = ProtocolFactory.get_protocol(service_uri)
             
             # Use cached protocol handler or create new one
             if protocol not in self._protocol_handler_cache:
@@ -4,18 +4,12 @@ import random
 import urllib.parse
 from typing import List, Tuple
 
-from kazoo.client import KazooClient
-from kazoo.retry import KazooRetry
-
-import nacos
-
 class RegistryStrategy(abc.ABC):
     """Registry strategy abstract class"""
 
     def __init__(self):
         self.logger = logging.getLogger(__name__)
 
-    @abc.abstractmethod
     def get_provider(self, address: str, interface: str) -> str:
         """
         Get service provider URI from registry
@@ -27,6 +21,20 @@ class RegistryStrategy(abc.ABC):
         Returns:
             provider URI, format: protocol://host:port
         """
+        return self.select_provider_by_weight(self.get_providers(address, interface))
+
+    @abc.abstractmethod
+    def get_providers(self, address: str, interface: str) -> List[Tuple[str, float]]:
+        """
+        Get all service providers from registry
+        
+        Parameters:
+            address: registry address
+            interface: interface name
+            
+        Returns:
+            list of (uri, weight) tuples, uri format: protocol://host:port
+        """
         pass
         
     def select_provider_by_weight(self, weighted_hosts: List[Tuple[str, float]]) -> str:
@@ -58,6 +66,26 @@ class RegistryStrategy(abc.ABC):
                 
         return random.choice([uri for uri, _ in weighted_hosts])
 
+    def get_candidates(self, address: str, interface: str, count: int = 2) -> List[str]:
+        """
+        Get several distinct providers, ordered by weighted random selection
+        
+        Parameters:
+            address: registry address
+            interface: interface name
+            count: max number of providers to return
+            
+        Returns:
+            list of provider URIs, the first one is the preferred provider
+        """
+        remaining = list(self.get_providers(address, interface))
+        candidates = []
+        while remaining and len(candidates) < count:
+            uri = self.select_provider_by_weight(remaining)
+            candidates.append(uri)
+            remaining = [(u, w) for u, w in remaining if u != uri]
+        return candidates
+
 
 class ZookeeperRegistryStrategy(RegistryStrategy):
     """ZooKeeper registry strategy implementation"""
@@ -66,18 +94,21 @@ class ZookeeperRegistryStrategy(RegistryStrategy):
         super().__init__()
         self.DUBBO_ZK_PROVIDERS = '/dubbo/{}/providers'
 
-    def get_provider(self, address: str, interface: str) -> str:
+    def get_providers(self, address: str, interface: str) -> List[Tuple[str, float]]:
         """
-        Get provider URI from ZooKeeper
+        Get providers from ZooKeeper
         
         Parameters:
             address: ZooKeeper address, format: host:port
             interface: interface name
             
         Returns:
-            Provider URI, format: protocol://host:port
+            list of (uri, weight) tuples, uri format: protocol://host:port
         """
         import time
+        # kazoo和nacos只在使用对应的注册中心时才导入，避免拖慢插件的启动
+        from kazoo.client import KazooClient
+        from kazoo.retry import KazooRetry
         start_time = time.time()
         
         self.logger.debug(f"ZooKeeper: get provider: {address}, {interface}")
@@ -142,7 +173,7 @@ class ZookeeperRegistryStrategy(RegistryStrategy):
                 self.logger.error(f"ZooKeeper: no valid provider found: {protocol_providers}")
                 raise ValueError(f"Cannot parse valid URI from provider URL")
                 
-            return self.select_provider_by_weight(weighted_hosts)
+            return weighted_hosts
         finally:
             elapsed_time = time.time() - start_time
             self.logger.debug(f"ZooKeeper: get provider cost: {elapsed_time:.2f} seconds")
@@ -158,17 +189,18 @@ class ZookeeperRegistryStrategy(RegistryStrategy):
 class NacosRegistryStrategy(RegistryStrategy):
     """Nacos registry strategy implementation"""
 
-    def get_provider(self, address: str, interface: str) -> str:
+    def get_providers(self, address: str, interface: str) -> List[Tuple[str, float]]:
         """
-        Get provider URI from Nacos
+        Get providers from Nacos
         
         Parameters:
             address: Nacos address, format: host:port
             interface: interface name
             
         Returns:
-            Provider URI, format: protocol://host:port
+            list of (uri, weight) tuples, uri format: protocol://host:port
         """
+        import nacos
         
         self.logger.debug(f"Nacos: get provider: {address}, {interface}")
         
@@ -199,11 +231,14 @@ class NacosRegistryStrategy(RegistryStrategy):
                         protocol = metadata.get('protocol', 'dubbo')
                         
                         if host_ip and host_port:
+                            # IPv6地址需要用方括号括起来
+                            if ':' in host_ip:
+                                host_ip = f"[{host_ip}]"
                             uri = f"{protocol}://{host_ip}:{host_port}"
                             weighted_hosts.append((uri, weight))
                     
                     if weighted_hosts:
-                        return self.select_provider_by_weight(weighted_hosts)
+                        return weighted_hosts
                     else:
                         self.logger.error(f"Nacos: no valid provider found for service: {interface}")
                         raise ValueError(f"Nacos: service {interface} has no valid providers")